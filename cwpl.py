@@ -1,3 +1,7 @@
+from datetime import date, datetime
+import os
+import sys
+
 import click
 
 import cwpl
@@ -27,5 +31,124 @@ def run():
     cwpl.show()
 
 
+@cli.command()
+@click.argument("folders", nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--scan",
+    "roots",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="add all git repositories found under directory",
+)
+def add_paths(folders, roots):
+    """add folders of repositories in single transaction"""
+
+    folders = [os.path.abspath(folder) for folder in folders]
+    for root in roots:
+        folders.extend(cwpl.find_repositories(root))
+
+    added = cwpl.add_paths(folders)
+    for folder in added:
+        click.echo(folder)
+    click.echo(f"{len(added)} paths added", err=True)
+
+
+# formats of --after and --before
+REPORT_DATE_FORMATS = ["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+
+
+class ReportDate(click.DateTime):
+    """Date or date time of REPORT_DATE_FORMATS, value without time is date,
+    so that --before date is taken till the end of day"""
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (date, datetime)):
+            return value
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            return super().convert(value, param, ctx)
+
+
+@cli.command()
+@click.option(
+    "--after",
+    type=ReportDate(REPORT_DATE_FORMATS),
+    help="report commits since date, end of previous month by default",
+)
+@click.option(
+    "--before",
+    type=ReportDate(REPORT_DATE_FORMATS),
+    help="report commits till date inclusive",
+)
+@click.option(
+    "--since-last",
+    is_flag=True,
+    help="report commits of each repository since previous report, "
+    "--after is used for repositories without it",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="report file, stdout by default",
+)
+@click.option(
+    "--sort",
+    is_flag=True,
+    help="sort all entries by date, entries are written by repository otherwise",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="print time of stages of each repository to stderr",
+)
+@click.option(
+    "--profile-dump",
+    type=click.Path(dir_okay=False, writable=True),
+    help="dump cProfile stats into file, repositories are fetched one by one",
+)
+def report(after, before, since_last, output, sort, profile, profile_dump):
+    """generate report without UI (for cron or CI)"""
+
+    if after is None:
+        after = cwpl.get_previous_month_end(date.today())
+    stats = cwpl.Stats() if profile else None
+    # modules are imported before profiling
+    write_report = cwpl.write_report
+
+    def run_report(max_workers=None):
+        return write_report(
+            output,
+            after.isoformat(),
+            before=before and before.isoformat(),
+            sort=sort,
+            on_error=lambda repo_log: click.echo(f"FAILED: {repo_log.error}", err=True),
+            stats=stats,
+            max_workers=max_workers,
+            since_last=since_last,
+            on_dropped=lambda folder, count: click.echo(
+                f"{folder}: {count} duplicated entries dropped", err=True
+            ),
+        )
+
+    if profile_dump:
+        import cProfile
+
+        # cProfile sees calling thread only
+        profiler = cProfile.Profile()
+        failed = profiler.runcall(run_report, max_workers=1)
+        profiler.dump_stats(profile_dump)
+    else:
+        failed = run_report()
+
+    if stats:
+        for line in stats.format():
+            click.echo(line, err=True)
+    if failed:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     cli()
@@ -1,6 +1,25 @@
-import os, sys; sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import os, sys
 
-from db import init_db
-from ui import show
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
+import importlib
 
+# modules of public functions, they are imported on first use,
+# so that commands do not load Tk or SQLAlchemy if they do not need them
+_LAZY_ATTRS = {
+    "init_db": "db",
+    "add_paths": "db",
+    "find_repositories": "scan",
+    "show": "ui",
+    "write_report": "report",
+    "get_previous_month_end": "report",
+    "Stats": "stats",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,236 @@
+from datetime import datetime, timedelta, timezone
+import fnmatch
+import functools
+
+from gitlog import Entry, GitLogError, fetch_git_log_delimited, iter_git_log
+from gitlog import get_ref_tips, is_ancestor, make_author_matcher
+from gitlog import decode_message, get_branches_pattern
+from stats import STAGE_GIT, measure
+
+
+# commits walked between checks of cancel token
+CANCEL_CHECK_INTERVAL = 1024
+
+
+class LogBackend:
+    """Reads commits of repository, after and before are timestamps
+
+    Backends return the same entries as delimited git log format,
+    they are used from worker threads, so they must not share state
+    between calls.
+    """
+
+    name = None
+
+    def fetch_log(
+        self,
+        path,
+        after,
+        branches=None,
+        revisions=None,
+        authors=None,
+        cancel_token=None,
+        before=None,
+        stats=None,
+        subjects_only=False,
+    ):
+        """Returns entries of commits committed from after till before,
+        revisions (e.g. ["tip", "^old_tip"]) are walked instead of branches
+
+        If subjects_only is set, backend may return subjects instead of
+        messages, such entries are marked as subject_only.
+        """
+        raise NotImplementedError
+
+    def get_ref_tips(self, path, branches=None):
+        """Returns {ref: commit} of refs which are walked by fetch_log"""
+        raise NotImplementedError
+
+    def is_ancestor(self, path, commit, tip):
+        """Check that commit is reachable from tip"""
+        raise NotImplementedError
+
+
+class GitLogBackend(LogBackend):
+    """Runs git process for each call"""
+
+    name = "git"
+
+    def fetch_log(
+        self,
+        path,
+        after,
+        branches=None,
+        revisions=None,
+        authors=None,
+        cancel_token=None,
+        before=None,
+        stats=None,
+        subjects_only=False,
+    ):
+        before = before and f"@{before}"
+        if revisions is None:
+            return fetch_git_log_delimited(
+                path,
+                f"@{after}",
+                branches=branches,
+                authors=authors,
+                cancel_token=cancel_token,
+                before=before,
+                stats=stats,
+                subjects_only=subjects_only,
+            )
+        return list(
+            iter_git_log(
+                path,
+                f"@{after}",
+                revisions=revisions,
+                authors=authors,
+                cancel_token=cancel_token,
+                before=before,
+                stats=stats,
+                subjects_only=subjects_only,
+            )
+        )
+
+    def get_ref_tips(self, path, branches=None):
+        return get_ref_tips(path, branches)
+
+    def is_ancestor(self, path, commit, tip):
+        return is_ancestor(path, commit, tip)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_offset_timezone(minutes):
+    """Returns timezone and git offset (e.g. +0130) of offset in minutes"""
+
+    sign = "-" if minutes < 0 else "+"
+    hours, rest = divmod(abs(minutes), 60)
+    return timezone(timedelta(minutes=minutes)), f"{sign}{hours:02}{rest:02}"
+
+
+class Pygit2LogBackend(LogBackend):
+    """Walks commits by libgit2 in process, without running git
+
+    pygit2 is optional dependency, it is imported on first use.
+    Commits are walked by commit time and walk stops at first commit
+    older than after, like git log --after does, so commits with
+    skewed time behind it are not returned.
+    """
+
+    name = "pygit2"
+
+    @staticmethod
+    def _open(path):
+        try:
+            import pygit2
+        except ImportError as e:
+            raise GitLogError(f"{path}: pygit2 is not installed") from e
+        try:
+            return pygit2, pygit2.Repository(path)
+        except pygit2.GitError as e:
+            raise GitLogError(f"{path}: {e}") from e
+
+    @staticmethod
+    def _get_tips(path, repo, branches):
+        if not branches:
+            if repo.head_is_unborn:
+                raise GitLogError(f"{path}: no commits")
+            return {"HEAD": str(repo.head.target)}
+
+        pattern = get_branches_pattern(branches)
+        tips = {}
+        for name in repo.references:
+            if name.startswith("refs/heads/") and fnmatch.fnmatchcase(name, pattern):
+                tips[name] = str(repo.references[name].resolve().target)
+        return tips
+
+    def fetch_log(
+        self,
+        path,
+        after,
+        branches=None,
+        revisions=None,
+        authors=None,
+        cancel_token=None,
+        before=None,
+        stats=None,
+        subjects_only=False,
+    ):
+        # message is read with commit anyway, so it is returned in full
+        pygit2, repo = self._open(path)
+        is_author = make_author_matcher(authors) if authors else None
+        entries = []
+        with measure(stats, STAGE_GIT, path) as git_stats:
+            try:
+                mailmap = pygit2.Mailmap.from_repository(repo)
+                walker = repo.walk(None, pygit2.enums.SortMode.TIME)
+                if revisions is None:
+                    revisions = self._get_tips(path, repo, branches).values()
+                for rev in revisions:
+                    if rev.startswith("^"):
+                        walker.hide(repo.revparse_single(rev[1:]).id)
+                    else:
+                        walker.push(repo.revparse_single(rev).id)
+
+                for n, commit in enumerate(walker):
+                    if cancel_token and n % CANCEL_CHECK_INTERVAL == 0:
+                        cancel_token.check(path)
+                    timestamp = commit.commit_time
+                    if timestamp < after:
+                        break
+                    if before and timestamp > before:
+                        continue
+                    # %aN <%ae>: only name is mapped by mailmap
+                    name = mailmap.resolve_signature(commit.author).name
+                    author = f"{name} <{commit.author.email}>"
+                    if is_author and not is_author(author):
+                        continue
+                    tz, offset = _get_offset_timezone(commit.commit_time_offset)
+                    date = datetime.fromtimestamp(timestamp, tz)
+                    entries.append(
+                        Entry(
+                            str(commit.id),
+                            author,
+                            date.strftime("%Y-%m-%d %H:%M:%S ") + offset,
+                            timestamp,
+                            decode_message(commit.raw_message, commit.message_encoding),
+                        )
+                    )
+            except (pygit2.GitError, KeyError, ValueError) as e:
+                raise GitLogError(f"{path}: {e}") from e
+            git_stats.entries = len(entries)
+        return entries
+
+    def get_ref_tips(self, path, branches=None):
+        pygit2, repo = self._open(path)
+        try:
+            return self._get_tips(path, repo, branches)
+        except pygit2.GitError as e:
+            raise GitLogError(f"{path}: {e}") from e
+
+    def is_ancestor(self, path, commit, tip):
+        pygit2, repo = self._open(path)
+        if commit == tip:
+            return True
+        try:
+            return repo.descendant_of(tip, commit)
+        except (pygit2.GitError, KeyError, ValueError):
+            # unknown commit (e.g. removed by gc) is not an ancestor
+            return False
+
+
+DEF_LOG_BACKEND = GitLogBackend.name
+
+LOG_BACKENDS = {
+    backend.name: backend for backend in (GitLogBackend(), Pygit2LogBackend())
+}
+
+
+def get_log_backend(name=None):
+    """Returns log backend by name, default one if name is not set"""
+
+    try:
+        return LOG_BACKENDS[name or DEF_LOG_BACKEND]
+    except KeyError:
+        raise ValueError(f"unknown log backend: {name}") from None
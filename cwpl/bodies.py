@@ -0,0 +1,156 @@
+import subprocess
+import threading
+
+from gitlog import GitLogError, decode_message, popen_git
+
+
+# commits requested at once, requests of batch fit into pipe buffer,
+# so writing them does not wait for git while its output is not read
+BODY_BATCH_SIZE = 256
+# time to wait for git cat-file to exit after its input is closed, s
+CLOSE_TIMEOUT = 5
+
+
+def parse_commit_message(data):
+    """Returns message of raw commit object, decoded by its encoding"""
+
+    headers, _, message = data.partition(b"\n\n")
+    encoding = None
+    for line in headers.split(b"\n"):
+        if line.startswith(b"encoding "):
+            encoding = line[len(b"encoding ") :].decode("ascii", "replace")
+    return decode_message(message, encoding)
+
+
+class CatFileBatch:
+    """Long-lived git cat-file --batch process of repository
+    which reads messages of commits by hashes
+
+    Process is started on first request and restarted if it exited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._process = None
+
+    def _get_process(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = popen_git(
+                self.path,
+                ["cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def read_messages(self, commits):
+        """Returns {commit: message} of commits, unknown commits are skipped"""
+
+        messages = {}
+        with self._lock:
+            process = self._get_process()
+            try:
+                for start in range(0, len(commits), BODY_BATCH_SIZE):
+                    batch = commits[start : start + BODY_BATCH_SIZE]
+                    process.stdin.write("".join(f"{c}\n" for c in batch).encode())
+                    process.stdin.flush()
+                    for commit in batch:
+                        # <hash> <type> <size> or <name> missing
+                        header = process.stdout.readline()
+                        if not header:
+                            raise GitLogError(f"{self.path}: git cat-file exited")
+                        fields = header.split()
+                        if len(fields) != 3:
+                            continue
+                        # object is followed by new line
+                        data = process.stdout.read(int(fields[2]) + 1)
+                        if fields[1] == b"commit":
+                            messages[commit] = parse_commit_message(data[:-1])
+            except (OSError, ValueError) as e:
+                self._kill()
+                raise GitLogError(f"{self.path}: {e}") from e
+        return messages
+
+    def _kill(self):
+        process, self._process = self._process, None
+        if process is not None:
+            process.kill()
+            process.wait()
+            for stream in (process.stdin, process.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    # data left in buffer of closed pipe
+                    pass
+
+    def close(self):
+        with self._lock:
+            process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(CLOSE_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+class BodyLoader:
+    """Loads messages of subject_only entries on demand
+    by CatFileBatch of their repositories
+
+    transform(entry) is applied to loaded entries, e.g. to extract
+    custom IDs from message.
+    """
+
+    def __init__(self, transform=None):
+        self.transform = transform
+        # {commit: folder} of entries without body
+        self._folders = {}
+        # {folder: CatFileBatch}
+        self._batches = {}
+
+    def add(self, folder, entries):
+        """Remember repository of entries without body"""
+        folders = self._folders
+        for entry in entries:
+            if entry.subject_only:
+                folders.setdefault(entry.commit, folder)
+
+    def load(self, entries):
+        """Load messages of entries without body in batch per repository,
+        returns loaded entries"""
+
+        by_folder = {}
+        for entry in entries:
+            folder = self._folders.get(entry.commit)
+            if entry.subject_only and folder is not None:
+                by_folder.setdefault(folder, []).append(entry)
+
+        loaded = []
+        for folder, folder_entries in by_folder.items():
+            batch = self._batches.get(folder)
+            if batch is None:
+                batch = self._batches[folder] = CatFileBatch(folder)
+            commits = list(dict.fromkeys(entry.commit for entry in folder_entries))
+            messages = batch.read_messages(commits)
+            for entry in folder_entries:
+                message = messages.get(entry.commit)
+                if message is None:
+                    continue
+                entry.message = message
+                entry.subject_only = False
+                if self.transform:
+                    self.transform(entry)
+                loaded.append(entry)
+        return loaded
+
+    def close(self):
+        """Stop git processes"""
+        for batch in self._batches.values():
+            batch.close()
+        self._batches = {}
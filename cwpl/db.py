@@ -1,6 +1,8 @@
+import contextlib
 from enum import Enum
+import threading
 import sqlalchemy as sa
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
 
 
@@ -28,6 +30,81 @@ class User(Base):
         return f"User({self.id!r},'{self.name!r}')"
 
 
+class Commit(Base):
+    """Cached git log entry of repository"""
+
+    __tablename__ = "commit"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path_id = Column(Integer, ForeignKey("path.id"), index=True)
+    commit = Column(String(64))
+    author = Column(String(4096))
+    date = Column(String(64))
+    timestamp = Column(Integer, index=True)
+    message = Column(Text)
+
+    def __repr__(self):
+        return f"Commit({self.id!r},{self.path_id!r},'{self.commit!r}')"
+
+
+class CommitCache(Base):
+    """State of commit cache of repository"""
+
+    __tablename__ = "commit_cache"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path_id = Column(Integer, ForeignKey("path.id"), unique=True)
+    # earliest commit timestamp covered by cache
+    after = Column(Integer)
+
+    def __repr__(self):
+        return f"CommitCache({self.id!r},{self.path_id!r},{self.after!r})"
+
+
+class RefTip(Base):
+    """Last seen tip of ref in repository"""
+
+    __tablename__ = "ref_tip"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path_id = Column(Integer, ForeignKey("path.id"), index=True)
+    ref = Column(String(4096))
+    tip = Column(String(64))
+
+    def __repr__(self):
+        return f"RefTip({self.id!r},{self.path_id!r},'{self.ref!r}','{self.tip!r}')"
+
+
+class ReportCutoff(Base):
+    """Time till which commits of repository were reported by last report"""
+
+    __tablename__ = "report_cutoff"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path_id = Column(Integer, ForeignKey("path.id"), unique=True)
+    timestamp = Column(Integer)
+
+    def __repr__(self):
+        return f"ReportCutoff({self.id!r},{self.path_id!r},{self.timestamp!r})"
+
+
+class CustomIdRule(Base):
+    """Rule to extract custom ID from commit message,
+    ID is the first group of pattern or the whole match
+    """
+
+    # default rules: {name: pattern}
+    DEF_RULES = {
+        "change_id": r"(?i)change-id\s*:\s*([A-Za-z0-9]+)",
+        "jira": r"\b([A-Z][A-Z0-9]+-[0-9]+)\b",
+        "github": r"(?<![\w&/])#([0-9]+)\b",
+    }
+
+    __tablename__ = "custom_id_rule"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(256), unique=True)
+    pattern = Column(String(4096))
+
+    def __repr__(self):
+        return f"CustomIdRule({self.id!r},'{self.name!r}','{self.pattern!r}')"
+
+
 class ConfBool(Enum):
     Y = "Y"
     N = "N"
@@ -63,6 +140,13 @@ class Config(Base):
     DEF_GIT_LOG_IN_BRANCHES = "git_log_in_branches"
     DEF_GIT_LOG_BRANCHES = "git_log_branches"
     DEF_ENTRY_SHOW_CUSTOM_ID = "entry_show_custom_id"
+    DEF_GIT_LOG_WORKERS = "git_log_workers"
+    DEF_GIT_LOG_USE_FORMAT = "git_log_use_format"
+    DEF_GIT_LOG_CACHE = "git_log_cache"
+    DEF_GIT_LOG_BACKEND = "git_log_backend"
+    DEF_GIT_LOG_LAZY_BODIES = "git_log_lazy_bodies"
+    DEF_TRANSFORM_WORKERS = "transform_workers"
+    DEF_TRANSFORM_CHUNK_SIZE = "transform_chunk_size"
     # default values:
     DEF_DATE_FORMAT_VALUE = r"%Y-%m-%d %H:%M:%S %z"
     DEF_GIT_LOG_FORMAT_VALUE = (
@@ -72,6 +156,15 @@ class Config(Base):
     DEF_GIT_LOG_IN_BRANCHES_VALUE = ConfBool.N.value
     DEF_GIT_LOG_BRANCHES_VALUE = "*"
     DEF_ENTRY_SHOW_CUSTOM_ID_VALUE = ConfBool.N.value
+    DEF_GIT_LOG_WORKERS_VALUE = "8"
+    DEF_GIT_LOG_USE_FORMAT_VALUE = ConfBool.N.value
+    DEF_GIT_LOG_CACHE_VALUE = ConfBool.Y.value
+    # git or pygit2
+    DEF_GIT_LOG_BACKEND_VALUE = "git"
+    DEF_GIT_LOG_LAZY_BODIES_VALUE = ConfBool.N.value
+    # worker processes of transformation, 0 to transform in process
+    DEF_TRANSFORM_WORKERS_VALUE = "0"
+    DEF_TRANSFORM_CHUNK_SIZE_VALUE = "2000"
 
     DEF_CONFIG = {
         DEF_DATE_FORMAT: DEF_DATE_FORMAT_VALUE,
@@ -80,6 +173,13 @@ class Config(Base):
         DEF_GIT_LOG_IN_BRANCHES: DEF_GIT_LOG_IN_BRANCHES_VALUE,
         DEF_GIT_LOG_BRANCHES: DEF_GIT_LOG_BRANCHES_VALUE,
         DEF_ENTRY_SHOW_CUSTOM_ID: DEF_ENTRY_SHOW_CUSTOM_ID_VALUE,
+        DEF_GIT_LOG_WORKERS: DEF_GIT_LOG_WORKERS_VALUE,
+        DEF_GIT_LOG_USE_FORMAT: DEF_GIT_LOG_USE_FORMAT_VALUE,
+        DEF_GIT_LOG_CACHE: DEF_GIT_LOG_CACHE_VALUE,
+        DEF_GIT_LOG_BACKEND: DEF_GIT_LOG_BACKEND_VALUE,
+        DEF_GIT_LOG_LAZY_BODIES: DEF_GIT_LOG_LAZY_BODIES_VALUE,
+        DEF_TRANSFORM_WORKERS: DEF_TRANSFORM_WORKERS_VALUE,
+        DEF_TRANSFORM_CHUNK_SIZE: DEF_TRANSFORM_CHUNK_SIZE_VALUE,
     }
 
     __tablename__ = "config"
@@ -91,104 +191,224 @@ class Config(Base):
         return f"Config({self.id!r},'{self.name!r}', '{self.value!r}')"
 
 
+# pragmas of SQLite connection
+SQLITE_PRAGMAS = {
+    # readers do not block writer, e.g. fetching threads and UI
+    "journal_mode": "WAL",
+    # WAL is safe from corruption with NORMAL, only last commits may be lost
+    "synchronous": "NORMAL",
+    # wait for lock of other thread instead of failing, ms
+    "busy_timeout": "5000",
+    "temp_store": "MEMORY",
+}
+
+
+def make_engine(uri):
+    """Create engine which sets pragmas of each SQLite connection"""
+
+    engine = sa.create_engine(uri)
+
+    @sa.event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
 sql_uri = "sqlite:///cwpl.sqlite"
-sql_engine = sa.create_engine(sql_uri)
+sql_engine = make_engine(sql_uri)
 
+# session of unit of work running in thread
+_local = threading.local()
 
-def init_db():
+
+@contextlib.contextmanager
+def unit_of_work():
+    """Session shared by DB functions called inside of block
+
+    Changes are committed once at the end of the outermost block
+    and rolled back on error. Objects stay loaded after commit.
+    """
+
+    session = getattr(_local, "session", None)
+    if session is not None:
+        # part of outer unit of work
+        yield session
+        return
+
+    with Session(sql_engine, expire_on_commit=False) as session:
+        _local.session = session
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            _local.session = None
+
+
+def create_tables():
+    """create tables missing in DB"""
+    has_rules = sa.inspect(sql_engine).has_table(CustomIdRule.__tablename__)
     Base.metadata.create_all(sql_engine)
 
-    with Session(sql_engine) as session:
+    # DB created before rules were added gets default rules
+    if not has_rules:
+        with unit_of_work() as session:
+            _add_default_custom_id_rules(session)
+
+
+def _add_default_custom_id_rules(session):
+    rules = [
+        CustomIdRule(name=name, pattern=pattern)
+        for name, pattern in CustomIdRule.DEF_RULES.items()
+    ]
+    session.add_all(rules)
+
+
+def init_db():
+    create_tables()
+
+    with unit_of_work() as session:
         session.execute(sa.delete(Config))
         configs = [
-            Config(name=name, value=value)
-            for name, value in Config.DEFAULT_CONFIGS.items()
+            Config(name=name, value=value) for name, value in Config.DEF_CONFIG.items()
         ]
         session.add_all(configs)
-        session.commit()
+        session.execute(sa.delete(CustomIdRule))
+        _add_default_custom_id_rules(session)
 
 
 def get_all_paths():
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
         return session.query(Path).all()
 
 
 def get_all_users():
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
         return session.query(User).all()
 
 
 def get_all_configs():
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
         return session.query(Config).all()
 
 
+def get_config():
+    """Returns {name: value} of all configs with default values"""
+    config = Config.DEF_CONFIG.copy()
+    for cfg in get_all_configs():
+        config[cfg.name] = cfg.value
+    return config
+
+
+def get_custom_id_rules():
+    """Returns list of (name, pattern) of custom ID rules in order of adding"""
+    with unit_of_work() as session:
+        rows = session.execute(
+            sa.select(CustomIdRule.name, CustomIdRule.pattern).order_by(CustomIdRule.id)
+        )
+        return [tuple(row) for row in rows]
+
+
+def add_custom_id_rule(name, pattern):
+    with unit_of_work() as session:
+        rule = CustomIdRule(name=name, pattern=pattern)
+        session.add(rule)
+        return rule
+
+
+def delete_custom_id_rules_by_name(name):
+    with unit_of_work() as session:
+        res = session.execute(sa.delete(CustomIdRule).where(CustomIdRule.name == name))
+        return res.rowcount
+
+
 def add_user(name):
-    with Session(sql_engine, expire_on_commit=False) as session:
+    with unit_of_work() as session:
         user = User(name=name)
         session.add(user)
-        session.commit()
         return user
 
 
 def add_path(folder):
-    with Session(sql_engine, expire_on_commit=False) as session:
+    with unit_of_work() as session:
         path = Path(folder=folder)
         session.add(path)
-        session.commit()
         return path
 
 
+def add_users(names):
+    """Add users missing in DB by single insert, returns names of added users"""
+    with unit_of_work() as session:
+        existing = set(session.scalars(sa.select(User.name)))
+        added = [name for name in dict.fromkeys(names) if name not in existing]
+        if added:
+            session.execute(sa.insert(User), [{"name": name} for name in added])
+        return added
+
+
+def add_paths(folders):
+    """Add paths missing in DB by single insert, returns folders of added paths"""
+    with unit_of_work() as session:
+        existing = set(session.scalars(sa.select(Path.folder)))
+        added = [folder for folder in dict.fromkeys(folders) if folder not in existing]
+        if added:
+            session.execute(sa.insert(Path), [{"folder": folder} for folder in added])
+        return added
+
+
 def delete_users(ids):
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
         res = session.execute(sa.delete(User).where(User.id.in_(ids)))
-        session.commit()
         return res.rowcount
 
 
 def delete_users_by_name(name):
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
         res = session.execute(sa.delete(User).where(User.name == name))
-        session.commit()
         return res.rowcount
 
 
 def delete_paths(ids):
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
+        _delete_path_data(session, ids)
         res = session.execute(sa.delete(Path).where(Path.id.in_(ids)))
-        session.commit()
         return res.rowcount
 
 
 def delete_paths_by_folder(folder):
-    with Session(sql_engine) as session:
+    with unit_of_work() as session:
+        ids = session.scalars(sa.select(Path.id).where(Path.folder == folder)).all()
+        _delete_path_data(session, ids)
         res = session.execute(sa.delete(Path).where(Path.folder == folder))
-        session.commit()
         return res.rowcount
 
 
 def update_user(id, new_name):
-    with Session(sql_engine, expire_on_commit=False) as session:
+    with unit_of_work() as session:
         user = session.query(User).filter(User.id == id).first()
         if user is None:
             return None
         user.name = new_name
-        session.commit()
         return user
 
 
 def update_path(id, new_folder):
-    with Session(sql_engine, expire_on_commit=False) as session:
+    with unit_of_work() as session:
         path = session.query(Path).filter(Path.id == id).first()
         if path is None:
             return None
         path.folder = new_folder
-        session.commit()
         return path
 
 
 def update_config_by_name(config_name, new_config_value):
-    with Session(sql_engine, expire_on_commit=False) as session:
+    with unit_of_work() as session:
         config = session.query(Config).filter(Config.name == config_name).first()
         if config is None:
             print(f"Config {config_name} not found! Creating ...")
@@ -196,5 +416,157 @@ def update_config_by_name(config_name, new_config_value):
             session.add(config)
         else:
             config.value = new_config_value
-        session.commit()
         return config
+
+
+def update_configs(configs):
+    """Set values of configs {name: value} in single transaction"""
+    with unit_of_work() as session:
+        existing = {
+            config.name: config
+            for config in session.scalars(
+                sa.select(Config).where(Config.name.in_(list(configs)))
+            )
+        }
+        for name, value in configs.items():
+            if name in existing:
+                existing[name].value = value
+            else:
+                session.add(Config(name=name, value=value))
+
+
+def get_path_id(folder):
+    with unit_of_work() as session:
+        return session.scalars(
+            sa.select(Path.id).where(Path.folder == folder).limit(1)
+        ).first()
+
+
+def _delete_path_data(session, path_ids):
+    for table in (Commit, CommitCache, RefTip, ReportCutoff):
+        session.execute(sa.delete(table).where(table.path_id.in_(path_ids)))
+
+
+def get_commit_cache(path_id):
+    """Returns ({ref: tip}, after) of repository commit cache,
+    after is None if there is no cache"""
+
+    with unit_of_work() as session:
+        after = session.scalars(
+            sa.select(CommitCache.after).where(CommitCache.path_id == path_id)
+        ).first()
+        tips = session.execute(
+            sa.select(RefTip.ref, RefTip.tip).where(RefTip.path_id == path_id)
+        ).all()
+        return {ref: tip for ref, tip in tips}, after
+
+
+# serializes writes of commit cache: first fill of large repository is long
+# transaction, other fetching threads would fail after busy_timeout waiting for it
+_commit_cache_lock = threading.Lock()
+
+
+def update_commit_cache(path_id, tips, after, entries, invalidate=False):
+    """Store new entries and ref tips of repository,
+    drop all cached entries of repository if invalidate is set
+
+    Writes of threads are done one by one, reads of cache are not blocked.
+    """
+
+    with _commit_cache_lock, unit_of_work() as session:
+        if invalidate:
+            session.execute(sa.delete(Commit).where(Commit.path_id == path_id))
+        session.execute(sa.delete(CommitCache).where(CommitCache.path_id == path_id))
+        session.execute(sa.delete(RefTip).where(RefTip.path_id == path_id))
+
+        session.add(CommitCache(path_id=path_id, after=after))
+        if tips:
+            session.execute(
+                sa.insert(RefTip),
+                [
+                    {"path_id": path_id, "ref": ref, "tip": tip}
+                    for ref, tip in tips.items()
+                ],
+            )
+        if entries:
+            session.execute(
+                sa.insert(Commit),
+                [
+                    {
+                        "path_id": path_id,
+                        "commit": entry.commit,
+                        "author": entry.author,
+                        "date": entry.date,
+                        "timestamp": entry.timestamp,
+                        "message": entry.message,
+                    }
+                    for entry in entries
+                ],
+            )
+
+
+def get_cached_commits(path_id, after, before=None, authors=None):
+    """Returns cached entries of repository with timestamp from after
+    till before inclusive as (commit, author, date, timestamp, message),
+    if authors are set, only entries with any of them as substring of author"""
+
+    query = sa.select(
+        Commit.commit,
+        Commit.author,
+        Commit.date,
+        Commit.timestamp,
+        Commit.message,
+    ).where(Commit.path_id == path_id, Commit.timestamp >= after)
+    if before is not None:
+        query = query.where(Commit.timestamp <= before)
+    if authors is not None:
+        # instr is case sensitive unlike LIKE
+        query = query.where(
+            sa.or_(sa.false(), *[sa.func.instr(Commit.author, a) > 0 for a in authors])
+        )
+
+    with unit_of_work() as session:
+        rows = session.execute(query.order_by(Commit.timestamp.desc(), Commit.id)).all()
+        return [tuple(row) for row in rows]
+
+
+def get_report_cutoffs():
+    """Returns {folder: timestamp} of repositories reported by last report"""
+
+    with unit_of_work() as session:
+        rows = session.execute(
+            sa.select(Path.folder, ReportCutoff.timestamp).join(
+                ReportCutoff, ReportCutoff.path_id == Path.id
+            )
+        ).all()
+        return {folder: timestamp for folder, timestamp in rows}
+
+
+def update_report_cutoffs(cutoffs):
+    """Store cut-offs {folder: timestamp} of reported repositories,
+    later cut-off of previous report is kept, e.g. if older report
+    is generated again"""
+
+    with unit_of_work() as session:
+        path_ids = dict(
+            session.execute(
+                sa.select(Path.folder, Path.id).where(Path.folder.in_(list(cutoffs)))
+            ).all()
+        )
+        existing = {
+            cutoff.path_id: cutoff
+            for cutoff in session.scalars(
+                sa.select(ReportCutoff).where(
+                    ReportCutoff.path_id.in_(list(path_ids.values()))
+                )
+            )
+        }
+        for folder, timestamp in cutoffs.items():
+            path_id = path_ids.get(folder)
+            if path_id is None:
+                continue
+            cutoff = existing.get(path_id)
+            if cutoff is None:
+                session.add(ReportCutoff(path_id=path_id, timestamp=timestamp))
+            elif cutoff.timestamp < timestamp:
+                cutoff.timestamp = timestamp
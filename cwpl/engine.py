@@ -0,0 +1,579 @@
+import atexit
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+import multiprocessing
+import threading
+
+from db import get_path_id, get_commit_cache, update_commit_cache, get_cached_commits
+from backend import get_log_backend
+from gitlog import Entry, fetch_git_log, make_author_matcher
+from gitlog import DEF_CUSTOM_ID_RULES, make_log_entry_transformer
+from gitlog import transform_log_records
+from health import check_repository
+from stats import STAGE_CACHE, STAGE_DEDUP, STAGE_HEALTH, STAGE_TRANSFORM, measure
+
+
+DEF_MAX_WORKERS = 8
+# entries sent to transform worker process at once
+DEF_TRANSFORM_CHUNK_SIZE = 2000
+# total number of entries kept by FetchResultCache
+DEF_FETCH_RESULTS_ENTRIES = 500000
+
+
+# result of git log collection for single repository
+RepoLog = namedtuple("RepoLog", ["folder", "entries", "error"])
+
+
+def date_to_timestamp(value, end_of_day=False):
+    """Returns timestamp of ISO date, date without time zone is local
+
+    If end_of_day is set, date without time is taken till its last second,
+    e.g. to select commits till date inclusive.
+    """
+    if end_of_day:
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            next_day = datetime.combine(day + timedelta(days=1), datetime.min.time())
+            return int(next_day.timestamp()) - 1
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _is_rewritten(backend, folder, cached_tips, tips):
+    """Check that some of cached refs were removed or rewritten"""
+
+    for ref, cached_tip in cached_tips.items():
+        tip = tips.get(ref)
+        if tip is None:
+            return True
+        if tip != cached_tip and not backend.is_ancestor(folder, cached_tip, tip):
+            return True
+    return False
+
+
+class FetchResultCache:
+    """Bounded LRU cache of fetched entries of repositories
+
+    Entries are keyed by fetch parameters and tips of refs of repository,
+    so they are not reused after refs change. The least recently used
+    results are dropped when total number of cached entries exceeds
+    max_entries, larger results are not cached.
+    Fetched fields of entries are kept as immutable records, new entries
+    are created for each get, so entries changed by caller (e.g. transformed
+    or with loaded body) are not shared.
+    """
+
+    def __init__(self, max_entries=DEF_FETCH_RESULTS_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # {key: records of entries} from the least recently used
+        self._results = OrderedDict()
+        self._entries = 0
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        """Returns new entries of cached result or None"""
+        with self._lock:
+            records = self._results.get(key)
+            if records is None:
+                return None
+            self._results.move_to_end(key)
+        return [Entry.from_record(record) for record in records]
+
+    def put(self, key, entries):
+        if len(entries) > self.max_entries:
+            return
+        records = tuple(entry.as_record() for entry in entries)
+        with self._lock:
+            replaced = self._results.pop(key, None)
+            if replaced is not None:
+                self._entries -= len(replaced)
+            self._results[key] = records
+            self._entries += len(records)
+            while self._entries > self.max_entries:
+                _, dropped = self._results.popitem(last=False)
+                self._entries -= len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._entries = 0
+
+
+# results of fetches of UI session
+fetch_results = FetchResultCache()
+
+
+class TransformPool:
+    """Pool of transform worker processes shared by fetches
+
+    Workers are started on first use and kept till exit, so that
+    start-up of interpreters is not paid by each fetch. Pool is started
+    again if number of workers is changed or it is broken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._workers = 0
+
+    def get(self, workers):
+        """Returns ProcessPoolExecutor of workers"""
+        with self._lock:
+            if self._pool is not None and self._workers != workers:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            if self._pool is None:
+                # workers are not forked from process with running threads
+                self._pool = ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._workers = workers
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+# workers of transformation of all fetches of process
+transform_pool = TransformPool()
+atexit.register(transform_pool.shutdown)
+
+
+def fetch_git_log_cached(
+    folder,
+    after,
+    branches=None,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+    backend=None,
+    tips=None,
+):
+    """Returns git log of repository from commit cache,
+    only commits added after last fetch are read by log backend
+
+    after and before are timestamps, tips are {ref: commit} of backend.get_ref_tips
+    if they are already read.
+    Cache is dropped for repository if its branches were rewritten
+    or earlier date is requested.
+    Cache keeps commits of all authors, so that changes of authors
+    do not drop it, authors are filtered by DB. So git --author filter
+    is not used: first fetch of repository reads commits of all authors
+    (see test_authors_cache_fill of bench_pipeline.py), later ones read only
+    new commits.
+    """
+
+    backend = backend or get_log_backend()
+    path_id = get_path_id(folder)
+    if path_id is None:
+        return backend.fetch_log(
+            folder,
+            after,
+            branches=branches,
+            authors=authors,
+            cancel_token=cancel_token,
+            before=before,
+            stats=stats,
+        )
+
+    if tips is None:
+        tips = backend.get_ref_tips(folder, branches)
+    with measure(stats, STAGE_CACHE, folder):
+        cached_tips, cached_after = get_commit_cache(path_id)
+
+    invalidate = (
+        cached_after is None
+        or after < cached_after
+        or _is_rewritten(backend, folder, cached_tips, tips)
+    )
+    if invalidate:
+        cached_after = after
+        revisions = list(tips.values())
+    else:
+        # only new commits
+        revisions = [tip for ref, tip in tips.items() if cached_tips.get(ref) != tip]
+        if revisions:
+            revisions.extend(f"^{tip}" for tip in cached_tips.values())
+
+    entries = []
+    if revisions:
+        entries = backend.fetch_log(
+            folder,
+            cached_after,
+            revisions=revisions,
+            cancel_token=cancel_token,
+            stats=stats,
+        )
+    with measure(stats, STAGE_CACHE, folder) as cache_stats:
+        if invalidate or entries or tips != cached_tips:
+            update_commit_cache(
+                path_id, tips, cached_after, entries, invalidate=invalidate
+            )
+        rows = get_cached_commits(path_id, after, before=before, authors=authors)
+        cache_stats.entries = len(rows)
+    return [Entry(*row) for row in rows]
+
+
+def collect_git_logs(
+    folders,
+    after,
+    git_log_format=None,
+    branches=None,
+    max_workers=DEF_MAX_WORKERS,
+    on_progress=None,
+    use_cache=False,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+    log_backend=None,
+    cutoffs=None,
+    subjects_only=False,
+    check_authors=True,
+    results_cache=None,
+):
+    """Run git log in all folders concurrently
+
+    Returns list of RepoLog in order of folders.
+    after and before are ISO dates or date times, commits from after
+    till before inclusive are selected. Unlike git, which uses current
+    time for date without time, after is taken from midnight and
+    before till the end of its day.
+    cutoffs are {folder: timestamp}, commits of folder committed
+    after its cut-off are selected instead of commits from after.
+    git_log_format is JSON-like format for compatibility, it is read
+    by git process, otherwise commits are read by log backend of
+    log_backend name, default one is git with streaming delimited parser.
+    Commit cache is used without git_log_format only.
+    If subjects_only is set, git log backend reads only subjects of commits,
+    see BodyLoader to load their bodies. It has no effect with commit cache,
+    git_log_format or pygit2 backend, they return full messages.
+    If authors are set, only commits which author contains any of them are returned,
+    filtering is done by git and checked with make_author_matcher unless
+    check_authors is not set, e.g. if entries are checked by caller.
+    on_progress(repo_log, done, total) is called as soon as repository is processed.
+    Running git processes are killed and waiting repositories fail
+    when cancel_token is cancelled.
+    Time of stages of each repository is recorded into stats.
+    Folders are processed one by one in calling thread if max_workers is 1,
+    e.g. to profile it.
+    Each folder is checked by cached health check first, broken repository
+    fails with RepoHealthError without running git, other folders are fetched.
+    Fetched entries are reused from results_cache, FetchResultCache,
+    while refs of repository and parameters of fetch are the same.
+    """
+
+    if not folders:
+        return []
+
+    if authors is not None:
+        authors = list(authors)
+        is_author = make_author_matcher(authors)
+
+    backend = get_log_backend(log_backend)
+    after = date_to_timestamp(after)
+    if before:
+        before = date_to_timestamp(before, end_of_day=True)
+
+    def fetch_log(folder, folder_after, tips):
+        if use_cache and not git_log_format:
+            return fetch_git_log_cached(
+                folder,
+                folder_after,
+                branches=branches,
+                authors=authors,
+                cancel_token=cancel_token,
+                before=before,
+                stats=stats,
+                backend=backend,
+                tips=tips,
+            )
+        if git_log_format:
+            return fetch_git_log(
+                folder,
+                f"@{folder_after}",
+                git_log_format,
+                branches=branches,
+                authors=authors,
+                cancel_token=cancel_token,
+                before=before and f"@{before}",
+                stats=stats,
+            )
+        return backend.fetch_log(
+            folder,
+            folder_after,
+            branches=branches,
+            authors=authors,
+            cancel_token=cancel_token,
+            before=before,
+            stats=stats,
+            subjects_only=subjects_only,
+        )
+
+    def fetch(folder):
+        if cancel_token:
+            cancel_token.check(folder)
+        with measure(stats, STAGE_HEALTH, folder):
+            check_repository(folder)
+        if authors is not None and not authors:
+            return []
+        folder_after = after
+        if cutoffs and cutoffs.get(folder) is not None:
+            folder_after = cutoffs[folder] + 1
+        tips = None
+        if results_cache is not None:
+            tips = backend.get_ref_tips(folder, branches)
+            key = (
+                folder,
+                tuple(sorted(tips.items())),
+                folder_after,
+                before,
+                branches,
+                git_log_format,
+                None if authors is None else frozenset(authors),
+                backend.name,
+                use_cache,
+                subjects_only,
+            )
+            entries = results_cache.get(key)
+            if entries is None:
+                entries = fetch_log(folder, folder_after, tips)
+                results_cache.put(key, entries)
+        else:
+            entries = fetch_log(folder, folder_after, tips)
+        if authors is None or not check_authors or (use_cache and not git_log_format):
+            return entries
+        # git may match authors differently, e.g. with mailmap disabled
+        return [entry for entry in entries if is_author(entry.author)]
+
+    def fetch_repo_log(folder, fetch_result):
+        try:
+            return RepoLog(folder, fetch_result(), None)
+        except Exception as e:
+            return RepoLog(folder, [], e)
+
+    results = {}
+    if max_workers == 1:
+        for done, folder in enumerate(folders, 1):
+            repo_log = fetch_repo_log(folder, lambda: fetch(folder))
+            results[folder] = repo_log
+            if on_progress:
+                on_progress(repo_log, done, len(folders))
+        return [results[folder] for folder in folders]
+
+    workers = max(1, min(max_workers, len(folders)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, folder): folder for folder in folders}
+        for done, future in enumerate(as_completed(futures), 1):
+            folder = futures[future]
+            repo_log = fetch_repo_log(folder, future.result)
+            results[folder] = repo_log
+            if on_progress:
+                on_progress(repo_log, done, len(futures))
+
+    return [results[folder] for folder in futures.values()]
+
+
+def fetch_entries(
+    folders,
+    after,
+    date_format,
+    git_log_format=None,
+    branches=None,
+    max_workers=DEF_MAX_WORKERS,
+    on_progress=None,
+    use_cache=False,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+    custom_id_rules=DEF_CUSTOM_ID_RULES,
+    log_backend=None,
+    cutoffs=None,
+    subjects_only=False,
+    transform_workers=0,
+    transform_chunk_size=DEF_TRANSFORM_CHUNK_SIZE,
+    results_cache=None,
+):
+    """Collect git log of all folders, drop duplicates and transform entries
+
+    on_progress(repo_log, done, total) gets unique transformed entries
+    of repositories in order of folders, repository fetched early waits
+    till all folders before it are fetched. Duplicated entry is kept
+    by repository of the first folder, so that result does not depend on
+    time of fetches.
+    Custom IDs are extracted by custom_id_rules, list of (name, pattern).
+    If transform_workers is set, entries of repository are transformed
+    and checked by authors in chunks of transform_chunk_size entries
+    by worker processes of transform_pool, see transform_log_records.
+    Entries are transformed again if they are taken from results_cache.
+    Returns list of RepoLog in order of folders and number of dropped
+    duplicates by folder.
+    """
+
+    deduplicator = Deduplicator()
+    custom_id_rules = tuple(tuple(rule) for rule in custom_id_rules)
+    transform = make_log_entry_transformer(date_format, custom_id_rules)
+    if authors is not None:
+        authors = list(authors)
+    repo_logs = {}
+    # fetched repositories wait for deduplication till all previous folders
+    # are fetched, prefix of them is released at once
+    ordered = list(dict.fromkeys(folders))
+    pending = {}
+    released = 0
+
+    def transform_in_pool(entries):
+        pool = transform_pool.get(transform_workers)
+        chunks = [
+            entries[start : start + transform_chunk_size]
+            for start in range(0, len(entries), transform_chunk_size)
+        ]
+        futures = [
+            pool.submit(
+                transform_log_records,
+                [(e.author, e.date, e.timestamp, e.message) for e in chunk],
+                date_format,
+                custom_id_rules,
+                authors,
+            )
+            for chunk in chunks
+        ]
+        transformed = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                records = future.result()
+            except BrokenProcessPool:
+                # the next fetch starts new pool
+                transform_pool.shutdown()
+                raise
+            for index, date_parsed, custom_ids, custom_id in records:
+                entry = chunk[index]
+                entry.date_parsed = date_parsed
+                entry.custom_ids = custom_ids
+                entry.custom_id = custom_id
+                transformed.append(entry)
+        return transformed
+
+    def on_repo_log(repo_log, done, total):
+        nonlocal released
+        pending[repo_log.folder] = prepare(repo_log)
+        while released < len(ordered) and ordered[released] in pending:
+            prepared = pending.pop(ordered[released])
+            released += 1
+            release(prepared, released, len(ordered))
+
+    def prepare(repo_log):
+        """transform in pool or check authors as soon as repository is fetched"""
+        folder = repo_log.folder
+        entries = repo_log.entries
+        # single chunk is not worth sending to worker,
+        # pool is started for the first large repository
+        in_pool = transform_workers and len(entries) > transform_chunk_size
+        if in_pool:
+            with measure(stats, STAGE_TRANSFORM, folder) as transform_stats:
+                transform_stats.entries = len(entries)
+                entries = transform_in_pool(entries)
+        elif transform_workers and authors is not None:
+            is_author = make_author_matcher(authors)
+            entries = [entry for entry in entries if is_author(entry.author)]
+        return repo_log._replace(entries=entries), in_pool
+
+    def release(prepared, done, total):
+        repo_log, in_pool = prepared
+        folder = repo_log.folder
+        entries = repo_log.entries
+        with measure(stats, STAGE_DEDUP, folder) as dedup_stats:
+            dedup_stats.entries = len(entries)
+            entries = deduplicator.filter(entries, folder)
+            dedup_stats.dropped = dedup_stats.entries - len(entries)
+        if not in_pool:
+            with measure(stats, STAGE_TRANSFORM, folder) as transform_stats:
+                entries = [transform(entry) for entry in entries]
+                transform_stats.entries = len(entries)
+        repo_log = repo_log._replace(entries=entries)
+        repo_logs[repo_log.folder] = repo_log
+        if on_progress:
+            on_progress(repo_log, done, total)
+
+    collect_git_logs(
+        folders,
+        after,
+        git_log_format,
+        branches=branches,
+        max_workers=max_workers,
+        on_progress=on_repo_log,
+        use_cache=use_cache,
+        authors=authors,
+        cancel_token=cancel_token,
+        before=before,
+        stats=stats,
+        log_backend=log_backend,
+        cutoffs=cutoffs,
+        subjects_only=subjects_only,
+        # authors are checked with transformation
+        check_authors=not transform_workers,
+        results_cache=results_cache,
+    )
+    return [repo_logs[folder] for folder in folders], deduplicator.dropped
+
+
+def merge_repo_logs(repo_logs):
+    """Merge entries of all repositories into single list"""
+
+    entries = []
+    for repo_log in repo_logs:
+        entries.extend(repo_log.entries)
+    return entries
+
+
+class Deduplicator:
+    """Drops entries with already seen commit and message in single pass,
+    keeps first occurrence and order of entries
+
+    Key of entry is its commit and full message, set lookup compares
+    hashes first (hash of message is computed once and cached by str),
+    messages are compared in full only if hashes are equal.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        # number of dropped entries by folder
+        self.dropped = {}
+
+    def filter(self, entries, folder=None):
+        seen = self.seen
+        kept = []
+        for entry in entries:
+            key = (entry.commit, entry.message)
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(entry)
+
+        self.dropped[folder] = self.dropped.get(folder, 0) + len(entries) - len(kept)
+        return kept
+
+
+def dedup_repo_logs(repo_logs):
+    """Merge entries of all repositories without duplicates
+
+    Returns entries and number of dropped duplicates by folder.
+    """
+
+    deduplicator = Deduplicator()
+    entries = []
+    for repo_log in repo_logs:
+        entries.extend(deduplicator.filter(repo_log.entries, repo_log.folder))
+    return entries, deduplicator.dropped
@@ -0,0 +1,691 @@
+import codecs
+from datetime import datetime, timedelta, timezone
+import fnmatch
+import functools
+import json
+import os
+import re
+import subprocess
+import threading
+
+from stats import STAGE_DECODE, STAGE_FIX_QUOTES, STAGE_GIT, STAGE_PARSE, measure
+
+
+class GitLogError(Exception):
+    """git log failed for repository"""
+
+
+class CancelToken:
+    """Cancels git log fetching, kills running git processes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = set()
+        self.cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            process.kill()
+
+    def register(self, process):
+        """register running git process, it is killed if already cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._processes.add(process)
+                return
+        process.kill()
+
+    def unregister(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def check(self, path):
+        """raise GitLogError if cancelled"""
+        if self.cancelled:
+            raise GitLogError(f"{path}: cancelled")
+
+
+class Entry:
+    """Git log entry"""
+
+    COMMIT = "commit"
+    AUTHOR = "author"
+    MESSAGE = "message"
+    DATE = "date"
+    TIMESTAMP = "timestamp"
+    DATE_PARSED = "date_parsed"
+    CUSTOM_ID = "custom_id"
+    # fields of git log format
+    KEYS = (COMMIT, AUTHOR, DATE, MESSAGE)
+
+    __slots__ = (
+        COMMIT,
+        AUTHOR,
+        DATE,
+        TIMESTAMP,
+        MESSAGE,
+        DATE_PARSED,
+        CUSTOM_ID,
+        "custom_ids",
+        "extra",
+        "subject_only",
+    )
+
+    def __init__(self, commit, author, date, timestamp, message, extra=None):
+        self.commit = commit
+        self.author = author
+        self.date = date
+        self.timestamp = timestamp
+        self.message = message
+        self.date_parsed = None
+        # first of custom IDs
+        self.custom_id = ""
+        # {rule name: ID} of custom ID rules
+        self.custom_ids = None
+        # other fields of custom git log format
+        self.extra = extra
+        # message is subject, body is loaded on demand
+        self.subject_only = False
+
+    @staticmethod
+    def from_dict(item):
+        """Create entry from fields parsed from custom git log format"""
+        item = dict(item)
+        return Entry(
+            item.pop(Entry.COMMIT),
+            item.pop(Entry.AUTHOR),
+            item.pop(Entry.DATE),
+            item.pop(Entry.TIMESTAMP, None),
+            item.pop(Entry.MESSAGE),
+            item or None,
+        )
+
+    def as_dict(self):
+        """Returns fields of git log format and custom IDs"""
+        fields = {key: getattr(self, key) for key in Entry.KEYS}
+        if self.extra:
+            fields.update(self.extra)
+        if self.custom_ids:
+            fields.update(self.custom_ids)
+        return fields
+
+    def as_record(self):
+        """Returns fetched fields as immutable tuple, see from_record"""
+        extra = tuple(self.extra.items()) if self.extra else None
+        return (
+            self.commit,
+            self.author,
+            self.date,
+            self.timestamp,
+            self.message,
+            extra,
+            self.subject_only,
+        )
+
+    @staticmethod
+    def from_record(record):
+        """Create new entry from tuple of as_record"""
+        commit, author, date, timestamp, message, extra, subject_only = record
+        entry = Entry(
+            commit, author, date, timestamp, message, dict(extra) if extra else None
+        )
+        entry.subject_only = subject_only
+        return entry
+
+    def __repr__(self):
+        return f"Entry('{self.commit!r}','{self.author!r}','{self.date!r}')"
+
+
+# delimited git log format: fields are separated by NUL,
+# records are terminated by record separator
+GIT_LOG_FIELD_SEPARATOR = "\x00"
+GIT_LOG_RECORD_SEPARATOR = "\x1e"
+# fields are in order of Entry arguments
+GIT_LOG_FIELDS = (
+    Entry.COMMIT,
+    Entry.AUTHOR,
+    Entry.DATE,
+    Entry.TIMESTAMP,
+    Entry.MESSAGE,
+)
+GIT_LOG_FORMAT = "%H%x00%aN <%ae>%x00%ci%x00%ct%x00%B%x1e"
+# the same fields with subject instead of message
+GIT_LOG_SUBJECT_FORMAT = "%H%x00%aN <%ae>%x00%ci%x00%ct%x00%s%x1e"
+GIT_LOG_CHUNK_SIZE = 64 * 1024
+
+
+def parse_git_log_record(record):
+    """Parse single delimited record into log entry"""
+
+    # commits are separated with NUL (-z) or new line
+    values = record.lstrip("\x00\n").split(
+        GIT_LOG_FIELD_SEPARATOR, len(GIT_LOG_FIELDS) - 1
+    )
+    if len(values) != len(GIT_LOG_FIELDS):
+        raise GitLogError(f"wrong format: expected {len(GIT_LOG_FIELDS)} fields")
+    commit, author, date, timestamp, message = values
+    try:
+        return Entry(commit, author, date, int(timestamp), message)
+    except ValueError as e:
+        raise GitLogError(f"wrong format: {e}") from e
+
+
+def parse_git_log_records(chunks, stats=None, path=None):
+    """Parse delimited git log output chunk by chunk, yields log entries
+
+    Decoding and parsing are recorded into stats as stages of path.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    # parts of unfinished record
+    pending = []
+    for chunk in chunks:
+        with measure(stats, STAGE_DECODE, path) as decoded:
+            text = decoder.decode(chunk)
+            decoded.size = len(chunk)
+        if GIT_LOG_RECORD_SEPARATOR not in text:
+            pending.append(text)
+            continue
+
+        with measure(stats, STAGE_PARSE, path) as parsed:
+            records = text.split(GIT_LOG_RECORD_SEPARATOR)
+            pending.append(records[0])
+            records[0] = "".join(pending)
+            pending = [records.pop()]
+            entries = [parse_git_log_record(record) for record in records]
+            parsed.entries = len(entries)
+        yield from entries
+
+    pending.append(decoder.decode(b"", final=True))
+    record = "".join(pending)
+    if record.strip("\x00\n"):
+        with measure(stats, STAGE_PARSE, path) as parsed:
+            entry = parse_git_log_record(record)
+            parsed.entries = 1
+        yield entry
+
+
+def _read_chunks(stream, stats=None, path=None):
+    """Yields chunks of output as soon as they are available,
+    time of waiting for git is recorded into stats
+    """
+
+    while True:
+        with measure(stats, STAGE_GIT, path) as read:
+            chunk = stream.read1(GIT_LOG_CHUNK_SIZE)
+            read.size = len(chunk)
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_before_args(before):
+    """Returns git log args to select commits not later than before"""
+
+    if not before:
+        return []
+    return [f"--before={before}"]
+
+
+def get_author_args(authors):
+    """Returns git log args to select commits with any of authors,
+    git matches authors as substrings of "name <email>" like make_author_matcher
+    """
+
+    if not authors:
+        return []
+    return ["--fixed-strings"] + [f"--author={author}" for author in authors]
+
+
+def make_author_matcher(authors):
+    """Returns function which checks that any of authors is substring of author"""
+
+    pattern = re.compile("|".join(re.escape(author) for author in authors))
+    return lambda author: pattern.search(author) is not None
+
+
+# environment of git processes: read-only commands do not take optional
+# locks (e.g. to refresh index), so they do not block git run by user,
+# output is not paged, credentials are not asked and messages are not translated
+GIT_ENV = {
+    "GIT_OPTIONAL_LOCKS": "0",
+    "GIT_PAGER": "cat",
+    "GIT_TERMINAL_PROMPT": "0",
+    "LC_ALL": "C",
+}
+
+
+def get_git_args(path, args):
+    """Returns command line of git command in repository folder"""
+
+    return ["git", "--no-pager", "-C", path, *args]
+
+
+def popen_git(path, args, **kwargs):
+    """Starts git command in repository folder with GIT_ENV
+
+    Working directory of the process is not changed, so git commands
+    can be run from many threads at once.
+    """
+
+    try:
+        return subprocess.Popen(
+            get_git_args(path, args), env={**os.environ, **GIT_ENV}, **kwargs
+        )
+    except OSError as e:
+        raise GitLogError(f"{path}: {e}") from e
+
+
+def iter_git_log(
+    path,
+    after,
+    branches=None,
+    revisions=None,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+    subjects_only=False,
+):
+    """Yields git log entries as they are read from git
+
+    revisions (e.g. ["tip", "^old_tip"]) are passed to git via stdin
+    instead of branches.
+    If subjects_only is set, message of entries is subject and they are
+    marked as subject_only, bodies can be loaded later by BodyLoader.
+    """
+
+    log_format = GIT_LOG_SUBJECT_FORMAT if subjects_only else GIT_LOG_FORMAT
+    args = [
+        "log",
+        "-z",
+        f"--format={log_format}",
+        f"--after={after}",
+        *get_before_args(before),
+        *get_author_args(authors),
+    ]
+    if revisions is not None:
+        args.append("--stdin")
+    # add branches if specified
+    elif branches:
+        args.append(f"--branches={branches}")
+
+    process = popen_git(
+        path,
+        args,
+        stdin=subprocess.PIPE if revisions is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if cancel_token:
+        cancel_token.register(process)
+
+    try:
+        if revisions is not None:
+            process.stdin.write(
+                "".join(f"{rev}\n" for rev in revisions).encode("utf-8")
+            )
+            process.stdin.close()
+
+        chunks = _read_chunks(process.stdout, stats, path)
+        for entry in parse_git_log_records(chunks, stats, path):
+            entry.subject_only = subjects_only
+            yield entry
+    except GitLogError as e:
+        raise GitLogError(f"{path}: {e}") from e
+    finally:
+        # stop git if consumer did not read all entries
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        err = process.stderr.read()
+        process.stderr.close()
+        process.wait()
+        if cancel_token:
+            cancel_token.unregister(process)
+
+    if cancel_token:
+        cancel_token.check(path)
+    if process.returncode:
+        raise GitLogError(f"{path}: {err.decode('utf-8', 'replace').strip()}")
+
+
+def fetch_git_log_delimited(
+    path,
+    after,
+    branches=None,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+    subjects_only=False,
+):
+    """Returns git log parsed from delimited format, raises GitLogError on failure"""
+
+    return list(
+        iter_git_log(
+            path,
+            after,
+            branches=branches,
+            authors=authors,
+            cancel_token=cancel_token,
+            before=before,
+            stats=stats,
+            subjects_only=subjects_only,
+        )
+    )
+
+
+def decode_message(data, encoding=None):
+    """Returns commit message decoded by encoding of commit, UTF-8 if it is
+    not set or unknown, like git log does"""
+
+    try:
+        return data.decode(encoding or "utf-8", "replace")
+    except LookupError:
+        return data.decode("utf-8", "replace")
+
+
+def run_git(path, args):
+    """Runs git command in repository, returns its output"""
+
+    process = popen_git(path, args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    if process.returncode:
+        raise GitLogError(f"{path}: {err.decode('utf-8', 'replace').strip()}")
+    return out.decode("utf-8", "replace")
+
+
+def get_branches_pattern(branches):
+    """Returns fnmatch pattern of refs selected by git log --branches=<branches>"""
+
+    pattern = "refs/heads/" + branches
+    if not any(c in branches for c in "*?["):
+        pattern += "/*"
+    return pattern
+
+
+def get_ref_tips(path, branches=None):
+    """Returns {ref: commit} of refs which are scanned by git log"""
+
+    if not branches:
+        return {"HEAD": run_git(path, ["rev-parse", "HEAD"]).strip()}
+
+    pattern = get_branches_pattern(branches)
+    tips = {}
+    out = run_git(
+        path, ["for-each-ref", "--format=%(objectname) %(refname)", "refs/heads/"]
+    )
+    for line in out.splitlines():
+        tip, ref = line.split(" ", 1)
+        if fnmatch.fnmatchcase(ref, pattern):
+            tips[ref] = tip
+    return tips
+
+
+def is_ancestor(path, commit, tip):
+    """Check that commit is reachable from tip"""
+
+    process = popen_git(
+        path,
+        ["merge-base", "--is-ancestor", commit, tip],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # unknown commit (e.g. removed by gc) is not an ancestor
+    return process.wait() == 0
+
+
+def fetch_git_log(
+    path,
+    after,
+    git_log_format,
+    branches=None,
+    authors=None,
+    cancel_token=None,
+    before=None,
+    stats=None,
+):
+    """Returns git log parsed from JSON-like git_log_format, raises GitLogError on failure"""
+    # git log --pretty=format:'{%n  \"commit\": \"%H\",%n  \"author\": \"%an\",%n  \"date\": \"%ad\",%n  \"message\": \"%f\"%n},'
+
+    args = [
+        "log",
+        f"--pretty=format:{git_log_format}",
+        f'--after="{after}"',
+        *get_before_args(before),
+        *get_author_args(authors),
+    ]
+    # add branches if specified
+    if branches:
+        args.append(f"--branches={branches}")
+
+    process = popen_git(path, args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if cancel_token:
+        cancel_token.register(process)
+    try:
+        with measure(stats, STAGE_GIT, path) as git_stats:
+            out, err = process.communicate()
+            git_stats.size = len(out)
+    finally:
+        if cancel_token:
+            cancel_token.unregister(process)
+    if cancel_token:
+        cancel_token.check(path)
+    if err:
+        raise GitLogError(f"{path}: {err.decode('utf-8').strip()}")
+    with measure(stats, STAGE_DECODE, path) as decoded:
+        raw_res = out.decode("utf-8")
+        decoded.size = len(out)
+
+    with measure(stats, STAGE_FIX_QUOTES, path):
+        json_res_fixed = _fix_git_log_json(path, raw_res)
+
+    # try to parse JSON
+    with measure(stats, STAGE_PARSE, path) as parsed:
+        try:
+            entries = [Entry.from_dict(item) for item in json.loads(json_res_fixed)]
+        except (ValueError, KeyError) as e:
+            raise GitLogError(f"{path}: {e}") from e
+        parsed.entries = len(entries)
+    return entries
+
+
+def _fix_git_log_json(path, raw_res):
+    """Returns JSON array of git log output, quotes in messages are escaped"""
+
+    # join multilines to pass into JSON parser
+    joined_res = ""
+    for line in raw_res.splitlines():
+        joined_res += line
+        if not line.endswith("},"):
+            joined_res += "\\n"
+
+    # remove last comma
+    if joined_res.endswith(","):
+        joined_res = joined_res[:-1]
+
+    json_res = "[" + joined_res + "]"
+
+    json_res_fixed = ""
+    if not joined_res:
+        json_res_fixed = json_res
+    else:
+        for l in json_res.replace("},{", "},\n{").splitlines():
+            # print(l)
+            match_msg = re.match(r"(^.*\"message\"\s*:\s*\")(.*)(\"},?)", l)
+            if match_msg is None:
+                raise GitLogError(f"{path}: wrong wormat: no message field!")
+            msg_groups = match_msg.groups()
+            if '"' in msg_groups[1]:
+                json_res_fixed += (
+                    msg_groups[0] + msg_groups[1].replace('"', '\\"') + msg_groups[2]
+                )
+            else:
+                json_res_fixed += l
+    # print("=" * 10)
+    return json_res_fixed
+
+
+# format of git date %ci
+GIT_ISO_DATE_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+# (name, pattern) of custom ID rules if they are not configured
+DEF_CUSTOM_ID_RULES = (("change_id", r"(?i)change-id\s*:\s*([A-Za-z0-9]+)"),)
+# number of memoized dates parsed by custom format
+DATE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def _get_timezone(offset):
+    """Returns timezone of git offset, e.g. +0130"""
+
+    if len(offset) != 5 or offset[0] not in "+-" or not offset[1:].isdigit():
+        raise ValueError(f"wrong offset: {offset}")
+    delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:]))
+    return timezone(-delta if offset[0] == "-" else delta)
+
+
+def make_date_parser(date_format):
+    """Returns function which parses date of log entry by date_format
+
+    Date in git ISO format is made of timestamp and offset of entry,
+    other formats are parsed by memoized strptime.
+    """
+
+    @functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+    def strptime(date):
+        return datetime.strptime(date, date_format)
+
+    if date_format != GIT_ISO_DATE_FORMAT:
+        return lambda entry: strptime(entry.date)
+
+    def parse_git_iso_date(entry):
+        if entry.timestamp is None:
+            return strptime(entry.date)
+        try:
+            tz = _get_timezone(entry.date[-5:])
+        except ValueError:
+            return strptime(entry.date)
+        return datetime.fromtimestamp(entry.timestamp, tz)
+
+    return parse_git_iso_date
+
+
+# global inline flags at start of pattern, e.g. (?i)
+_GLOBAL_FLAGS_RE = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+def make_custom_id_matcher(rules):
+    """Returns function which finds custom IDs of all rules in message
+
+    rules are (name, pattern), ID is the first group of pattern or the whole
+    match, name is used as field of entry. Patterns are combined into single
+    alternation, so that message is scanned once.
+    Function returns {name: first ID of rule or ""}.
+    Raises ValueError for wrong rule.
+    """
+
+    # {group of rule: (name, group of ID)}
+    groups = {}
+    alternatives = []
+    group = 1
+    for name, pattern in rules:
+        if not name.isidentifier() or name in Entry.__slots__:
+            raise ValueError(f"{name}: name of rule should be a new identifier")
+        # flags of pattern should not change other patterns
+        flags = _GLOBAL_FLAGS_RE.match(pattern)
+        if flags:
+            pattern = f"(?{flags.group(1)}:{pattern[flags.end():]})"
+        try:
+            rule_groups = re.compile(pattern).groups
+        except re.error as e:
+            raise ValueError(f"{name}: {e}") from e
+        if rule_groups > 1:
+            raise ValueError(f"{name}: pattern should have at most one group")
+        groups[group] = (name, group + rule_groups)
+        alternatives.append(f"({pattern})")
+        group += 1 + rule_groups
+
+    empty = {name: "" for name, _ in rules}
+    if not alternatives:
+        return lambda message: {}
+    try:
+        finditer = re.compile("|".join(alternatives)).finditer
+    except re.error as e:
+        raise ValueError(str(e)) from e
+
+    def match(message):
+        found = {}
+        for custom_id_match in finditer(message):
+            # outer group of rule is closed last
+            name, id_group = groups[custom_id_match.lastindex]
+            if name not in found:
+                found[name] = custom_id_match.group(id_group) or ""
+                if len(found) == len(groups):
+                    break
+        return {**empty, **found}
+
+    return match
+
+
+@functools.lru_cache(maxsize=16)
+def make_log_entry_transformer(date_format, custom_id_rules=DEF_CUSTOM_ID_RULES):
+    """Returns function which transforms log entry like transform_log_entry,
+    date parser and custom ID matcher are prepared once
+
+    custom_id_rules is tuple of (name, pattern).
+    """
+
+    parse_date = make_date_parser(date_format)
+    match_custom_ids = make_custom_id_matcher(custom_id_rules)
+
+    def transform(git_log_entry):
+        git_log_entry.date_parsed = parse_date(git_log_entry)
+        custom_ids = match_custom_ids(git_log_entry.message)
+        git_log_entry.custom_ids = custom_ids
+        git_log_entry.custom_id = ""
+        for custom_id in custom_ids.values():
+            if custom_id:
+                git_log_entry.custom_id = custom_id
+                break
+        return git_log_entry
+
+    return transform
+
+
+def transform_log_entry(
+    git_log_entry, date_format, custom_id_rules=DEF_CUSTOM_ID_RULES
+):
+    """Add data to log entry:
+    * convert date
+    * extract custom IDs of rules, custom ID is the first of them
+    """
+
+    transform = make_log_entry_transformer(date_format, tuple(custom_id_rules))
+    return transform(git_log_entry)
+
+
+def transform_log_records(records, date_format, custom_id_rules, authors=None):
+    """Transform records of log entries like transform_log_entry,
+    e.g. in worker process
+
+    records are (author, date, timestamp, message) of entries, custom_id_rules
+    is tuple of (name, pattern). If authors are set, records of other authors
+    are dropped, see make_author_matcher.
+    Returns (index of record, date_parsed, custom_ids, custom_id) of kept records.
+    """
+
+    transform = make_log_entry_transformer(date_format, custom_id_rules)
+    is_author = make_author_matcher(authors) if authors is not None else None
+    transformed = []
+    for index, (author, date, timestamp, message) in enumerate(records):
+        if is_author and not is_author(author):
+            continue
+        entry = transform(Entry(None, author, date, timestamp, message))
+        transformed.append(
+            (index, entry.date_parsed, entry.custom_ids, entry.custom_id)
+        )
+    return transformed
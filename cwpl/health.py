@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+
+from gitlog import GitLogError, run_git
+
+
+_HASH_RE = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+
+class RepoHealthError(GitLogError):
+    """Folder is not valid git repository, it is skipped by fetch"""
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_line(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.readline().strip()
+
+
+def find_git_dirs(folder):
+    """Returns (git dir, common dir) of repository in folder,
+    common dir keeps refs shared by worktrees, raises RepoHealthError if it is not repository
+    """
+
+    if not os.path.isdir(folder):
+        raise RepoHealthError(f"{folder}: folder not found")
+
+    dot_git = os.path.join(folder, ".git")
+    if os.path.isdir(dot_git):
+        git_dir = dot_git
+    elif os.path.isfile(dot_git):
+        # worktree or submodule
+        try:
+            line = _read_line(dot_git)
+        except OSError as e:
+            raise RepoHealthError(f"{folder}: {e}") from e
+        if not line.startswith("gitdir:"):
+            raise RepoHealthError(f"{folder}: wrong .git file")
+        git_dir = os.path.join(folder, line[len("gitdir:") :].strip())
+    elif (
+        os.path.isfile(os.path.join(folder, "HEAD"))
+        and os.path.isdir(os.path.join(folder, "objects"))
+        and os.path.isdir(os.path.join(folder, "refs"))
+    ):
+        # bare repository
+        git_dir = folder
+    else:
+        raise RepoHealthError(f"{folder}: not a git repository")
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        try:
+            common_dir = os.path.join(git_dir, _read_line(commondir_file))
+        except OSError as e:
+            raise RepoHealthError(f"{folder}: {e}") from e
+    return os.path.normpath(git_dir), os.path.normpath(common_dir)
+
+
+def _has_ref(git_dir, common_dir, ref):
+    """Check that ref is loose or packed ref of repository"""
+
+    for refs_dir in (git_dir, common_dir):
+        if os.path.isfile(os.path.join(refs_dir, ref)):
+            return True
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), encoding="utf-8") as f:
+            suffix = f" {ref}"
+            return any(line.rstrip("\n").endswith(suffix) for line in f)
+    except FileNotFoundError:
+        return False
+
+
+def _check_branches_by_git(folder):
+    """Check by git that repository has branches, e.g. refs in reftable
+    or HEAD without commits next to other branches"""
+
+    try:
+        out = run_git(
+            folder, ["for-each-ref", "--count=1", "--format=%(refname)", "refs/heads/"]
+        )
+    except GitLogError as e:
+        raise RepoHealthError(str(e)) from e
+    if not out.strip():
+        raise RepoHealthError(f"{folder}: no branches, no commits?")
+
+
+def check_git_dirs(folder, git_dir, common_dir):
+    """Check that HEAD of repository is readable and points to commit,
+    raises RepoHealthError otherwise
+
+    If ref of HEAD is not found in files, repository is checked by git.
+    """
+
+    try:
+        head = _read_line(os.path.join(git_dir, "HEAD"))
+        if head.startswith("ref:"):
+            ref = head[len("ref:") :].strip()
+            if not _has_ref(git_dir, common_dir, ref):
+                _check_branches_by_git(folder)
+        elif not _HASH_RE.match(head):
+            raise RepoHealthError(f"{folder}: wrong HEAD")
+    except OSError as e:
+        raise RepoHealthError(f"{folder}: {e}") from e
+
+
+class RepoHealthCache:
+    """Results of checks of repositories
+
+    Result is reused while modification times of repository folder,
+    .git, HEAD, packed refs, folder of branches and reftable are the same,
+    git replaces ref and table files by rename, so their folder is changed
+    on any update of branch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {folder: (git dir, common dir, mtimes, error)}
+        self._results = {}
+
+    @staticmethod
+    def _mtimes(folder, git_dir, common_dir):
+        paths = [folder, os.path.join(folder, ".git")]
+        if git_dir:
+            paths.append(os.path.join(git_dir, "HEAD"))
+            paths.append(os.path.join(common_dir, "packed-refs"))
+            paths.append(os.path.join(common_dir, "refs", "heads"))
+            paths.append(os.path.join(common_dir, "reftable"))
+        return tuple(_mtime(path) for path in paths)
+
+    def check(self, folder):
+        """Check that folder is valid git repository, raises RepoHealthError otherwise"""
+
+        with self._lock:
+            cached = self._results.get(folder)
+        if cached:
+            git_dir, common_dir, mtimes, error = cached
+            if self._mtimes(folder, git_dir, common_dir) == mtimes:
+                if error:
+                    raise error
+                return
+
+        git_dir = common_dir = None
+        # files are stat before check, so that changes during check are seen later
+        mtimes = self._mtimes(folder, None, None)
+        error = None
+        try:
+            git_dir, common_dir = find_git_dirs(folder)
+            mtimes = self._mtimes(folder, git_dir, common_dir)
+            check_git_dirs(folder, git_dir, common_dir)
+        except RepoHealthError as e:
+            error = e
+
+        with self._lock:
+            self._results[folder] = (git_dir, common_dir, mtimes, error)
+        if error:
+            raise error
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+# cache of checks shared by all fetches
+health_cache = RepoHealthCache()
+
+
+def check_repository(folder):
+    """Check that folder is valid git repository by shared cache,
+    raises RepoHealthError otherwise"""
+
+    health_cache.check(folder)
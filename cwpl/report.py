@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from operator import attrgetter
+import time
+
+from db import ConfBool, Config, create_tables, get_config
+from db import get_all_paths, get_all_users, get_custom_id_rules
+from db import get_report_cutoffs, update_report_cutoffs
+from engine import date_to_timestamp, fetch_entries
+from gitlog import Entry
+from stats import STAGE_RENDER, measure
+
+
+def get_previous_month_end(today):
+    """Returns previous month"""
+    return date(today.year, today.month, 1) + timedelta(-2)
+
+
+def render_entry(entry, entry_log_format):
+    """Returns text of entry in report"""
+    return entry_log_format.format(**entry.as_dict()).replace(r"\n", "\n")
+
+
+def get_report_cutoff(before=None):
+    """Returns cut-off of report taken before fetch: end of before
+    or current time"""
+    if before:
+        return date_to_timestamp(before, end_of_day=True)
+    return int(time.time())
+
+
+def mark_reported(folders, cutoff):
+    """Store cut-off of report for folders, so that the next report
+    since last one takes only commits made after it"""
+    update_report_cutoffs({folder: cutoff for folder in folders})
+
+
+def write_report(
+    output,
+    after,
+    before=None,
+    sort=False,
+    on_error=None,
+    stats=None,
+    max_workers=None,
+    since_last=False,
+    on_dropped=None,
+):
+    """Fetch git log of all paths and write report of users' commits into output
+
+    Entries are written as soon as repository is fetched, sorted by date
+    inside of repository, or all together if sort is set.
+    on_error(repo_log) is called for repository which failed to fetch.
+    on_dropped(folder, count) is called for repository with duplicated entries
+    dropped, e.g. entries of clones which were reported for other repository.
+    Time of stages is recorded into stats.
+    max_workers overrides number of workers of config.
+    Cut-off of report (end of before or current time) is stored for each fetched
+    repository, if since_last is set, only commits after cut-off of previous
+    report are reported, after is used for repositories without it.
+    Returns list of failed RepoLog.
+    """
+
+    create_tables()
+    config = get_config()
+    folders = [p.folder for p in get_all_paths()]
+    users = [u.name for u in get_all_users()]
+
+    def is_set(config_name):
+        return ConfBool.from_string(config[config_name]) == ConfBool.Y
+
+    git_log_format = None
+    if is_set(Config.DEF_GIT_LOG_USE_FORMAT):
+        git_log_format = config[Config.DEF_GIT_LOG_FORMAT]
+    branches = None
+    if is_set(Config.DEF_GIT_LOG_IN_BRANCHES):
+        branches = config[Config.DEF_GIT_LOG_BRANCHES]
+    if max_workers is None:
+        max_workers = config[Config.DEF_GIT_LOG_WORKERS]
+        if not max_workers.isdigit():
+            max_workers = Config.DEF_GIT_LOG_WORKERS_VALUE
+    entry_log_format = config[Config.DEF_ENTRY_LOG_FORMAT]
+
+    def get_number(config_name, default_value, minimum):
+        value = config[config_name]
+        if not value.isdigit() or int(value) < minimum:
+            value = default_value
+        return int(value)
+
+    transform_workers = get_number(
+        Config.DEF_TRANSFORM_WORKERS, Config.DEF_TRANSFORM_WORKERS_VALUE, 0
+    )
+    transform_chunk_size = get_number(
+        Config.DEF_TRANSFORM_CHUNK_SIZE, Config.DEF_TRANSFORM_CHUNK_SIZE_VALUE, 1
+    )
+
+    def write(entries, folder=None):
+        with measure(stats, STAGE_RENDER, folder) as render_stats:
+            for entry in sorted(entries, key=attrgetter(Entry.DATE_PARSED)):
+                text = render_entry(entry, entry_log_format)
+                output.write(text)
+                render_stats.size += len(text)
+            render_stats.entries = len(entries)
+        output.flush()
+
+    cutoffs = get_report_cutoffs() if since_last else None
+    cutoff = get_report_cutoff(before)
+    failed = []
+    fetched = []
+    reported = []
+
+    def on_progress(repo_log, done, total):
+        if repo_log.error:
+            failed.append(repo_log)
+            if on_error:
+                on_error(repo_log)
+            return
+        reported.append(repo_log.folder)
+        if sort:
+            fetched.extend(repo_log.entries)
+        else:
+            write(repo_log.entries, repo_log.folder)
+
+    _, dropped = fetch_entries(
+        folders,
+        after,
+        config[Config.DEF_DATE_FORMAT],
+        git_log_format,
+        branches=branches,
+        max_workers=int(max_workers),
+        on_progress=on_progress,
+        use_cache=is_set(Config.DEF_GIT_LOG_CACHE),
+        authors=users,
+        before=before,
+        stats=stats,
+        custom_id_rules=get_custom_id_rules(),
+        log_backend=config[Config.DEF_GIT_LOG_BACKEND],
+        cutoffs=cutoffs,
+        transform_workers=transform_workers,
+        transform_chunk_size=transform_chunk_size,
+    )
+    if on_dropped:
+        for folder, count in dropped.items():
+            if count:
+                on_dropped(folder, count)
+    if sort:
+        write(fetched)
+    mark_reported(reported, cutoff)
+    return failed
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+
+DEF_SCAN_WORKERS = 8
+# number of directories scanned by single task
+SCAN_BATCH_SIZE = 256
+# entries of bare repository
+_BARE_REPOSITORY_FILES = ("HEAD",)
+_BARE_REPOSITORY_DIRS = ("objects", "refs")
+
+
+def _scan_dir(path, subdirs):
+    """Check that directory is git repository,
+    otherwise add its subdirectories to subdirs"""
+
+    found = []
+    names = set()
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                # .git is directory of repository or file of worktree and submodule
+                if name == ".git":
+                    return True
+                if entry.is_dir(follow_symlinks=False):
+                    found.append(entry.path)
+                    names.add(name)
+                elif name in _BARE_REPOSITORY_FILES:
+                    names.add(name)
+    except OSError:
+        # no access or removed while scanning
+        return False
+
+    if names.issuperset(_BARE_REPOSITORY_FILES + _BARE_REPOSITORY_DIRS):
+        return True
+    subdirs.extend(found)
+    return False
+
+
+def _scan_dirs(paths):
+    """Returns repositories among paths and subdirectories of other paths"""
+
+    repositories = []
+    subdirs = []
+    for path in paths:
+        if _scan_dir(path, subdirs):
+            repositories.append(path)
+    return repositories, subdirs
+
+
+def find_repositories(root, max_workers=DEF_SCAN_WORKERS):
+    """Returns sorted absolute paths of git repositories under root
+
+    Directories are scanned concurrently level by level. Repositories are
+    detected by .git directory or file (worktree) and by layout of bare
+    repository, they are not scanned further, so nested repositories
+    are skipped. Symbolic links are not followed.
+    """
+
+    repositories = []
+    level = [os.path.abspath(root)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while level:
+            batches = [
+                level[i : i + SCAN_BATCH_SIZE]
+                for i in range(0, len(level), SCAN_BATCH_SIZE)
+            ]
+            level = []
+            for found, subdirs in pool.map(_scan_dirs, batches):
+                repositories.extend(found)
+                level.extend(subdirs)
+    return sorted(repositories)
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+import threading
+from time import perf_counter
+
+
+# stages of report generation
+STAGE_HEALTH = "health"
+STAGE_GIT = "git"
+STAGE_DECODE = "decode"
+STAGE_PARSE = "parse"
+STAGE_FIX_QUOTES = "fix quotes"
+STAGE_CACHE = "cache"
+STAGE_DEDUP = "dedup"
+STAGE_TRANSFORM = "transform"
+STAGE_TREEVIEW = "treeview"
+STAGE_RENDER = "render"
+
+
+class StageStats:
+    """Wall time, number of entries and bytes processed by stage
+    and number of entries dropped by it, e.g. duplicates"""
+
+    __slots__ = ("time", "entries", "size", "dropped")
+
+    def __init__(self, time=0.0, entries=0, size=0, dropped=0):
+        self.time = time
+        self.entries = entries
+        self.size = size
+        self.dropped = dropped
+
+    def add(self, other):
+        self.time += other.time
+        self.entries += other.entries
+        self.size += other.size
+        self.dropped += other.dropped
+
+    def __str__(self):
+        text = f"{self.time * 1000:.1f} ms"
+        if self.entries:
+            text += f", {self.entries} entries"
+        if self.size:
+            text += f", {self.size / 1024:.1f} KiB"
+        if self.dropped:
+            text += f", {self.dropped} dropped"
+        return text
+
+
+class Stats:
+    """Stats of stages by repository, stages are recorded from worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {folder: {stage: StageStats}}, folder is None for stages of all repositories
+        self.folders = {}
+
+    def add(self, stage, folder, stage_stats):
+        with self._lock:
+            stages = self.folders.setdefault(folder, {})
+            stages.setdefault(stage, StageStats()).add(stage_stats)
+
+    def totals(self):
+        """Returns {stage: StageStats} of all repositories"""
+
+        totals = {}
+        with self._lock:
+            for stages in self.folders.values():
+                for stage, stage_stats in stages.items():
+                    totals.setdefault(stage, StageStats()).add(stage_stats)
+        return totals
+
+    def summary(self):
+        """Returns single line of stage times and dropped entries"""
+
+        parts = []
+        for stage, stage_stats in self.totals().items():
+            part = f"{stage}: {stage_stats.time * 1000:.0f} ms"
+            if stage_stats.dropped:
+                part += f", {stage_stats.dropped} dropped"
+            parts.append(part)
+        return " | ".join(parts)
+
+    def format(self):
+        """Returns lines of stats of each repository and total"""
+
+        lines = []
+        with self._lock:
+            folders = {folder: dict(stages) for folder, stages in self.folders.items()}
+        for folder, stages in folders.items():
+            lines.append(f"{folder or 'all repositories'}:")
+            lines.extend(f"  {stage}: {s}" for stage, s in stages.items())
+        lines.append("total:")
+        lines.extend(f"  {stage}: {s}" for stage, s in self.totals().items())
+        return lines
+
+
+@contextmanager
+def measure(stats, stage, folder=None):
+    """Record wall time of block as stage of folder,
+    yields StageStats to set number of entries and bytes
+
+    Nothing is recorded if stats is None.
+    """
+
+    stage_stats = StageStats()
+    start = perf_counter()
+    try:
+        yield stage_stats
+    finally:
+        stage_stats.time = perf_counter() - start
+        if stats is not None:
+            stats.add(stage, folder, stage_stats)
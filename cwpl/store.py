@@ -0,0 +1,153 @@
+import bisect
+import re
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def get_words(text):
+    """Returns set of lower case words of text"""
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def get_entry_words(entry):
+    """Returns set of words of message, author and custom IDs of entry"""
+    text = [entry.message, entry.author, entry.custom_id]
+    if entry.custom_ids:
+        text.extend(entry.custom_ids.values())
+    return get_words(" ".join(text))
+
+
+class EntryStore:
+    """Fetched git log entries
+
+    Views refer to entries by their index in store.
+    Orders of entries by sort keys are cached, they are built on first
+    request and updated as entries are added.
+    Words of message, author and custom IDs of entries are indexed
+    as they are added, so search does not scan messages.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # {name: (key, keys of entries, indexes in ascending order)}
+        self.orders = {}
+        # {word: indexes of entries with word}
+        self.words = {}
+        # sorted words to find words by prefix, None if new words were added
+        self.vocabulary = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def add(self, entries, words=None):
+        """Add entries, returns range of their indexes
+
+        words are sets of words of entries by get_entry_words,
+        e.g. taken in other thread, they are taken from entries if not set.
+        """
+        start = len(self.entries)
+        self.entries.extend(entries)
+        added = range(start, len(self.entries))
+        if words is None:
+            words = [get_entry_words(entry) for entry in entries]
+        self._index(added, words)
+
+        for key, keys, order in self.orders.values():
+            keys.extend(key(entry) for entry in entries)
+            order.extend(sorted(added, key=keys.__getitem__))
+            # timsort merges two sorted runs in O(n), keys are not taken again
+            order.sort(key=keys.__getitem__)
+        return added
+
+    def update(self, indexes):
+        """Update index of words and cached orders of entries which were
+        changed in place, e.g. when their message was loaded
+
+        Words of changed entries are added to index, old ones are kept,
+        as message with body keeps words of its subject.
+        """
+        indexes = list(indexes)
+        if not indexes:
+            return
+        entries = self.entries
+        self._index(indexes, [get_entry_words(entries[index]) for index in indexes])
+
+        for key, keys, order in self.orders.values():
+            changed = False
+            for index in indexes:
+                value = key(entries[index])
+                if value != keys[index]:
+                    keys[index] = value
+                    changed = True
+            if changed:
+                # order is almost sorted, timsort takes O(n) for it
+                order.sort(key=keys.__getitem__)
+
+    def get_order(self, name, key, reverse=False):
+        """Returns indexes of entries sorted by key, order is cached by name
+
+        Keys are taken once per entry, cached order is reversed in O(n).
+        Returned list must not be modified, ascending one is updated by add.
+        """
+        cached = self.orders.get(name)
+        if cached is None:
+            keys = [key(entry) for entry in self.entries]
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self.orders[name] = (key, keys, order)
+        else:
+            order = cached[2]
+        return order[::-1] if reverse else order
+
+    def _index(self, indexes, entries_words):
+        words = self.words
+        vocabulary_size = len(words)
+        for index, entry_words in zip(indexes, entries_words):
+            for word in entry_words:
+                found = words.get(word)
+                if found is None:
+                    words[word] = [index]
+                else:
+                    found.append(index)
+        if len(words) != vocabulary_size:
+            self.vocabulary = None
+
+    def search(self, query):
+        """Returns set of indexes of entries which have words starting
+        with each word of query, None if there are no words in query"""
+
+        query_words = get_words(query)
+        if not query_words:
+            return None
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.words)
+        vocabulary = self.vocabulary
+
+        found = None
+        # the longest words match the least entries
+        for prefix in sorted(query_words, key=len, reverse=True):
+            matched = set()
+            start = bisect.bisect_left(vocabulary, prefix)
+            for word in vocabulary[start:]:
+                if not word.startswith(prefix):
+                    break
+                if found is None:
+                    matched.update(self.words[word])
+                else:
+                    matched.update(i for i in self.words[word] if i in found)
+            found = matched
+            if not found:
+                break
+        return found
+
+    def clear(self):
+        self.entries = []
+        self.orders = {}
+        self.words = {}
+        self.vocabulary = []
@@ -1,158 +1,39 @@
-from datetime import date, datetime, timedelta
+from datetime import date
 import json
-from os import path
-import os
-import re
-import subprocess
+from operator import attrgetter
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
-from tkcalendar import Calendar
+from tkinter import messagebox
+from tkcalendar import Calendar, DateEntry
 
 from db import ConfBool, get_all_users, add_user, delete_users_by_name
-from db import get_all_paths, add_path, delete_paths_by_folder
-from db import get_all_configs, update_config_by_name, Config
-
-
-def get_previous_month_end(today):
-    """Returns previous month"""
-    return date(today.year, today.month, 1) + timedelta(-2)
-
-
-def get_git_log(path, after, git_log_format, branches=None):
-    """Returns git log"""
-    # git log --pretty=format:'{%n  \"commit\": \"%H\",%n  \"author\": \"%an\",%n  \"date\": \"%ad\",%n  \"message\": \"%f\"%n},'
-
-    res = []
-    cwd = os.getcwd()
-    try:
-        os.chdir(path)
-        args = [
-            "git",
-            "log",
-            f"--pretty=format:{git_log_format}",
-            f'--after="{after}"',
-        ]
-        # add branches if specified
-        if branches:
-            args.append(f"--branches={branches}")
-
-        process = subprocess.Popen(
-            args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        out, err = process.communicate()
-        if err:
-            print(err.decode("utf-8").splitlines())
-            return res
-        raw_res = out.decode("utf-8")
-
-        # join multilines to pass into JSON parser
-        joined_res = ""
-        for line in raw_res.splitlines():
-            joined_res += line
-            if not line.endswith("},"):
-                joined_res += "\\n"
-
-        # remove last comma
-        if joined_res.endswith(","):
-            joined_res = joined_res[:-1]
-
-        json_res = "[" + joined_res + "]"
-
-        json_res_fixed = ""
-        if not joined_res:
-            json_res_fixed = json_res
-        else:
-            for l in json_res.replace("},{", "},\n{").splitlines():
-                # print(l)
-                match_msg = re.match(r"(^.*\"message\"\s*:\s*\")(.*)(\"},?)", l)
-                if match_msg is None:
-                    raise Exception(f"ERROR: wrong wormat: no message field!")
-                msg_groups = match_msg.groups()
-                if '"' in msg_groups[1]:
-                    json_res_fixed += (
-                        msg_groups[0]
-                        + msg_groups[1].replace('"', '\\"')
-                        + msg_groups[2]
-                    )
-                else:
-                    json_res_fixed += l
-        # print("=" * 10)
-
-        # try to parse JSON
-        res = json.loads(json_res_fixed)
-    except Exception as e:
-        print(f"EXCEPTION: {e}")
-    finally:
-        os.chdir(cwd)
-    return res
-
-
-class Entry:
-    """Git log entry"""
-
-    __PREFIX_PARSED = "x___"
-    COMMIT = "commit"
-    AUTHOR = "author"
-    MESSAGE = "message"
-    DATE = "date"
-    DATE_PARSED = __PREFIX_PARSED + DATE
-    CUSTOM_ID = __PREFIX_PARSED + "custom_id"
-
-    @staticmethod
-    def get_keys(item):
-
-        if isinstance(item, dict):
-            dict_keys = item.keys()
-            __get_attr = lambda key: key
-        else:
-            dict_keys = item.__dict__.keys()
-            __get_attr = lambda key: getattr(item, key)
-        return [
-            __get_attr(key)
-            for key in dict_keys
-            if not (
-                key.startswith("_")
-                or callable(__get_attr(key))
-                or __get_attr(key).startswith(Entry.__PREFIX_PARSED)
-            )
-        ]
-
-
-def transform_log_entry(git_log_entry, date_format):
-    """Add data to log entry:
-    * convert date
-    * extract comments
-    """
-
-    date = datetime.strptime(git_log_entry[Entry.DATE], date_format)
-    git_log_entry[Entry.DATE_PARSED] = date
-
-    # TODO: customize it
-    custom_id_match = re.search(
-        r"change-id\s*:\s*([A-Za-z0-9]+)",
-        git_log_entry[Entry.MESSAGE],
-        flags=re.I,
-    )
-    if custom_id_match:
-        git_log_entry[Entry.CUSTOM_ID] = custom_id_match.group(1)
-    else:
-        git_log_entry[Entry.CUSTOM_ID] = ""
-
-    return git_log_entry
-
-
-def get_unexisted_folders(folders_list):
-    """Get unexisted folders"""
-
-    folders = []
-    for i in folders_list:
-        if not path.exists(i):
-            folders.append(i)
-
-    return folders
+from db import get_all_paths, add_path, add_paths, delete_paths_by_folder
+from db import get_config, update_configs, Config, create_tables
+from db import get_custom_id_rules, add_custom_id_rule, delete_custom_id_rules_by_name
+from db import get_report_cutoffs
+from gitlog import CancelToken, Entry, GitLogError, make_custom_id_matcher
+from gitlog import transform_log_entry
+from bodies import BodyLoader
+from health import RepoHealthError
+from backend import LOG_BACKENDS
+from engine import fetch_entries, fetch_results
+from report import get_previous_month_end, get_report_cutoff, mark_reported
+from report import render_entry
+from scan import find_repositories
+from stats import STAGE_TREEVIEW, Stats, measure
+from store import EntryStore, get_entry_words
+from widgets import VirtualTreeview
+
+
+# how often results of background fetch are shown, ms
+FETCH_POLL_INTERVAL = 50
+# changed configs are written into DB together after delay, ms
+CONFIG_WRITE_DELAY = 500
+# prefix of treeview columns of custom ID rules
+CUSTOM_ID_COLUMN_PREFIX = "custom_id."
 
 
 def show():
@@ -189,6 +70,42 @@ def show():
         # update list of folders
         list_all_folders()
 
+    def cb_scan_folders():
+        """add all repositories found in folder"""
+
+        root_folder = filedialog.askdirectory()
+        if not root_folder:
+            return
+
+        scan_queue = queue.Queue()
+
+        def scan():
+            try:
+                scan_queue.put(find_repositories(root_folder))
+            except Exception as e:
+                scan_queue.put(e)
+
+        def poll_scan():
+            try:
+                result = scan_queue.get_nowait()
+            except queue.Empty:
+                root.after(FETCH_POLL_INTERVAL, poll_scan)
+                return
+
+            scan_button.config(state=tk.NORMAL)
+            if isinstance(result, Exception):
+                messagebox.showerror("Error", f"Failed to scan: {result}")
+                return
+            added = add_paths(result)
+            status_bar.config(text=f"{len(added)} folders added from {root_folder}")
+
+            # update list of folders
+            list_all_folders()
+
+        scan_button.config(state=tk.DISABLED)
+        threading.Thread(target=scan, daemon=True).start()
+        root.after(FETCH_POLL_INTERVAL, poll_scan)
+
     def list_all_folders():
         folders = [p.folder for p in get_all_paths()]
         sorted(folders)
@@ -227,66 +144,75 @@ def show():
         for user in users:
             users_list.insert(tk.END, user)
 
-    def get_git_log_entries():
-        folders = folders_list.get(0, tk.END)
-        users = users_list.get(0, tk.END)
-        if not folders:
-            return []
-
-        git_log_format = var_git_log_format.get()
-        date_format = var_date_format.get()
+    def cb_add_custom_id_rule():
+        name = rule_name_entry.get().strip()
+        pattern = rule_pattern_entry.get()
+        if not name or not pattern:
+            return
 
-        unexisting_folders = get_unexisted_folders(folders)
-        if unexisting_folders:
-            folder_error_str = r"\n".join(unexisting_folders)
-            tk.messagebox.showerror("Error", f"Folders not found: {folder_error_str}")
-            return []
+        rules = custom_id_rules["rules"]
+        if name in dict(rules):
+            return
+        try:
+            make_custom_id_matcher(rules + [(name, pattern)])
+        except ValueError as e:
+            messagebox.showerror("Error", f"Wrong rule: {e}")
+            return
 
-        after = data_calendar.get_date()
-        branches_names = None
-        if var_git_log_in_branches.get():
-            # TODO: change to variable
-            branches_names = config[Config.DEF_GIT_LOG_BRANCHES]
+        add_custom_id_rule(name, pattern)
 
-        raw_git_log = get_git_log(
-            folders[0], after, git_log_format, branches=branches_names
-        )
-        if not raw_git_log:
-            return []
-
-        filtered_git_log = []
-        for git_log in raw_git_log:
-            for author in users:
-                if author in git_log[Entry.AUTHOR]:
-                    filtered_git_log.append(git_log)
-                    break
-
-        entries = [
-            transform_log_entry(entry, date_format) for entry in filtered_git_log
-        ]
+        # update list of rules
+        list_all_custom_id_rules()
 
-        # delete entries with same commit
-        unique_commits = {}
-        for entry in entries:
-            entry_commit = entry[Entry.COMMIT]
-            found_same = False
-            if entry_commit in unique_commits:
-                # check that messages are the same
-                # if they are different - then it could be a coincidence
-                for i in unique_commits[entry_commit]:
-                    if i[Entry.MESSAGE] == entry[Entry.MESSAGE]:
-                        found_same = True
-                        break
-            else:
-                unique_commits[entry_commit] = []
-            if found_same:
-                entries.remove(entry)
-            else:
-                unique_commits[entry_commit].append(entry)
+    def cb_del_custom_id_rule():
+        if not rules_list.curselection():
+            return
+        name, _ = custom_id_rules["rules"][rules_list.curselection()[0]]
+        deleted = delete_custom_id_rules_by_name(name)
+        if deleted < 1:
+            return
+        # update list of rules
+        list_all_custom_id_rules()
+
+    def list_all_custom_id_rules():
+        custom_id_rules["rules"] = get_custom_id_rules()
+        rules_list.delete(0, tk.END)
+        for name, pattern in custom_id_rules["rules"]:
+            rules_list.insert(tk.END, f"{name}: {pattern}")
+        set_treeview_data_columns()
+        git_log_view.refresh()
+
+    def save_config(config_name, value):
+        """set config, it is written into DB with other configs changed
+        during CONFIG_WRITE_DELAY in single transaction"""
+
+        config[config_name] = value
+        config_writes["pending"][config_name] = value
+        if config_writes["job"] is None:
+            config_writes["job"] = root.after(CONFIG_WRITE_DELAY, flush_configs)
+
+    def flush_configs():
+        if config_writes["job"] is not None:
+            root.after_cancel(config_writes["job"])
+            config_writes["job"] = None
+        pending = config_writes["pending"]
+        if not pending:
+            return
+        config_writes["pending"] = {}
+        try:
+            update_configs(pending)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to update config: {e}")
 
-        return entries
+    def cb_close():
+        flush_configs()
+        git_log_fetch["bodies"].close()
+        root.destroy()
 
-    git_log_entries = {"data": [], "sort": (Entry.DATE_PARSED, True)}
+    # configs waiting to be written into DB
+    config_writes = {"pending": {}, "job": None}
+    custom_id_rules = {"rules": []}
+    git_log_entries = {"data": EntryStore(), "sort": (Entry.DATE_PARSED, True)}
 
     def set_columns_sort(column_name):
         sort_field, is_asc = git_log_entries["sort"]
@@ -301,76 +227,269 @@ def show():
             is_asc = True
 
         git_log_entries["sort"] = (column_name, is_asc)
-        set_git_log_data_tv()
+        sort_git_log_data_tv()
+
+    # state of running fetch
+    git_log_fetch = {
+        "token": None,
+        "queue": queue.Queue(),
+        "folders": {},
+        "stats": None,
+        # loader of messages of entries fetched without body
+        "bodies": BodyLoader(),
+        # cut-off of fetch and its fetched folders, stored by REPORT DONE
+        "cutoff": None,
+        "reported": [],
+    }
 
     def cb_get_git_log_data():
-        git_log_entries["data"] = get_git_log_entries()
-        set_git_log_data_tv()
+        if git_log_fetch["token"]:
+            return
 
-    def set_git_log_data_tv():
-        entries = git_log_entries["data"]
-        treeview_data.delete(*treeview_data.get_children())
-        if not entries:
+        store = git_log_entries["data"]
+        store.clear()
+        git_log_view.set_entries(store)
+
+        folders = folders_list.get(0, tk.END)
+        users = users_list.get(0, tk.END)
+        if not folders:
+            return
+
+        git_log_format = None
+        if var_git_log_use_format.get():
+            git_log_format = var_git_log_format.get()
+        date_format = var_date_format.get()
+
+        after = data_calendar.get_date()
+        before = None
+        if var_use_before.get():
+            before = before_entry.get_date().isoformat()
+        # commits of each repository after its previous report
+        cutoffs = get_report_cutoffs() if var_since_last.get() else None
+        branches_names = None
+        if var_git_log_in_branches.get():
+            # TODO: change to variable
+            branches_names = config[Config.DEF_GIT_LOG_BRANCHES]
+
+        max_workers = var_git_log_workers.get()
+        if not max_workers.isdigit():
+            max_workers = Config.DEF_GIT_LOG_WORKERS_VALUE
+        transform_workers = var_transform_workers.get()
+        if not transform_workers.isdigit():
+            transform_workers = Config.DEF_TRANSFORM_WORKERS_VALUE
+        transform_chunk_size = var_transform_chunk_size.get()
+        if not transform_chunk_size.isdigit() or not int(transform_chunk_size):
+            transform_chunk_size = Config.DEF_TRANSFORM_CHUNK_SIZE_VALUE
+        # tk variables can be read in main thread only
+        use_cache = bool(var_git_log_cache.get())
+        log_backend = var_git_log_backend.get()
+        if log_backend not in LOG_BACKENDS:
+            log_backend = Config.DEF_GIT_LOG_BACKEND_VALUE
+        rules = list(custom_id_rules["rules"])
+        # messages of commit cache are full
+        subjects_only = bool(var_git_log_lazy_bodies.get()) and not use_cache
+
+        # custom IDs of loaded messages are extracted again
+        git_log_fetch["bodies"].close()
+        git_log_fetch["bodies"] = BodyLoader(
+            lambda entry: transform_log_entry(entry, date_format, rules)
+        )
+
+        # show progress of each repository
+        git_log_fetch["folders"] = {folder: i for i, folder in enumerate(folders)}
+        fetch_status_list.delete(0, tk.END)
+        for folder in folders:
+            fetch_status_list.insert(tk.END, f"... {folder}")
+        fetch_progress.config(maximum=len(folders), value=0)
+        fetch_button.config(state=tk.DISABLED)
+        cancel_button.config(state=tk.NORMAL)
+
+        token = CancelToken()
+        stats = Stats()
+        fetch_queue = git_log_fetch["queue"]
+        git_log_fetch["token"] = token
+        git_log_fetch["stats"] = stats
+        git_log_fetch["cutoff"] = get_report_cutoff(before)
+        git_log_fetch["reported"] = []
+        status_bar.config(text="")
+
+        def on_progress(repo_log, done, total):
+            # words for search are taken in fetching thread, not in UI
+            words = [get_entry_words(entry) for entry in repo_log.entries]
+            fetch_queue.put(("repo", repo_log, done, words))
+
+        def fetch():
+            try:
+                _, dropped = fetch_entries(
+                    folders,
+                    after,
+                    date_format,
+                    git_log_format,
+                    branches=branches_names,
+                    max_workers=int(max_workers),
+                    on_progress=on_progress,
+                    use_cache=use_cache,
+                    authors=users,
+                    cancel_token=token,
+                    stats=stats,
+                    custom_id_rules=rules,
+                    log_backend=log_backend,
+                    before=before,
+                    cutoffs=cutoffs,
+                    subjects_only=subjects_only,
+                    transform_workers=int(transform_workers),
+                    transform_chunk_size=int(transform_chunk_size),
+                    # repeated fetch of unchanged repositories is not run again
+                    results_cache=fetch_results,
+                )
+                fetch_queue.put(("done", dropped))
+            except Exception as e:
+                token.cancel()
+                fetch_queue.put(("error", e))
+
+        threading.Thread(target=fetch, daemon=True).start()
+        root.after(FETCH_POLL_INTERVAL, poll_git_log_fetch)
+
+    def poll_git_log_fetch():
+        """show entries fetched by background thread"""
+
+        store = git_log_entries["data"]
+        fetch_queue = git_log_fetch["queue"]
+        stats = git_log_fetch["stats"]
+        added = False
+        while True:
+            try:
+                message = fetch_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if message[0] == "repo":
+                _, repo_log, done, words = message
+                if isinstance(repo_log.error, RepoHealthError):
+                    status = f"skipped: {repo_log.error}"
+                elif repo_log.error:
+                    status = f"failed: {repo_log.error}"
+                else:
+                    status = f"{len(repo_log.entries)} entries: {repo_log.folder}"
+                    git_log_fetch["reported"].append(repo_log.folder)
+                idx = git_log_fetch["folders"][repo_log.folder]
+                fetch_status_list.delete(idx)
+                fetch_status_list.insert(idx, status)
+                fetch_progress.config(value=done)
+                if repo_log.entries:
+                    with measure(stats, STAGE_TREEVIEW) as treeview_stats:
+                        # cached orders of store are updated, view is sorted later
+                        store.add(repo_log.entries, words)
+                        git_log_fetch["bodies"].add(repo_log.folder, repo_log.entries)
+                        treeview_stats.entries = len(repo_log.entries)
+                    added = True
+            elif message[0] == "done":
+                for folder, count in message[1].items():
+                    if count:
+                        idx = git_log_fetch["folders"][folder]
+                        status = fetch_status_list.get(idx)
+                        fetch_status_list.delete(idx)
+                        fetch_status_list.insert(
+                            idx, f"{status}, {count} duplicates dropped"
+                        )
+                finish_git_log_fetch()
+            else:
+                messagebox.showerror("Error", f"Failed to fetch: {message[1]}")
+                finish_git_log_fetch()
+
+        if added:
+            with measure(stats, STAGE_TREEVIEW):
+                sort_git_log_data_tv()
+        status_bar.config(text=stats.summary())
+        if git_log_fetch["token"]:
+            root.after(FETCH_POLL_INTERVAL, poll_git_log_fetch)
+
+    def finish_git_log_fetch():
+        git_log_fetch["token"] = None
+        fetch_button.config(state=tk.NORMAL)
+        cancel_button.config(state=tk.DISABLED)
+
+    def cb_report_done():
+        """store cut-offs of fetched repositories for report since last one"""
+        if git_log_fetch["token"] or git_log_fetch["cutoff"] is None:
             return
+        reported = git_log_fetch["reported"]
+        mark_reported(reported, git_log_fetch["cutoff"])
+        status_bar.config(text=f"cut-offs of {len(reported)} repositories stored")
 
+    def cb_cancel_git_log_fetch():
+        token = git_log_fetch["token"]
+        if token:
+            token.cancel()
+
+    def sort_git_log_data_tv():
         column_sort_field, column_sort_asc = git_log_entries["sort"]
-        # sort commits by date
-        entries.sort(
-            key=lambda entry: entry[column_sort_field], reverse=not column_sort_asc
+        if column_sort_field.startswith(CUSTOM_ID_COLUMN_PREFIX):
+            name = column_sort_field[len(CUSTOM_ID_COLUMN_PREFIX) :]
+            key = lambda entry: (entry.custom_ids or {}).get(name, "")
+        else:
+            key = attrgetter(column_sort_field)
+        store = git_log_entries["data"]
+        # orders of columns are cached by store, toggle only reverses it
+        order = store.get_order(column_sort_field, key, reverse=not column_sort_asc)
+        # entries found by index of words
+        found = store.search(var_search.get())
+        if found is not None:
+            order = [index for index in order if index in found]
+        git_log_view.set_order(order)
+
+    def get_git_log_row(entry):
+        lines = [l for l in entry.message.split("\n") if l.strip()] or [""]
+        if entry.subject_only:
+            # item can be opened to load message
+            lines.append("")
+        custom_ids = entry.custom_ids or {}
+        values = (
+            entry.author,
+            entry.date,
+            lines[0],
+            entry.custom_id,
+            *[custom_ids.get(name, "") for name, _ in custom_id_rules["rules"]],
         )
+        return entry.commit, values, lines[1:]
 
-        for entry in entries:
-            store_dict = {k: entry[k] for k in Entry.get_keys(entry)}
-            entry_str = json.dumps(store_dict)
-            lines = [l for l in entry[Entry.MESSAGE].split("\n") if l.strip()]
-
-            line_item = treeview_data.insert(
-                "",
-                tk.END,
-                text=entry[Entry.COMMIT],
-                values=(
-                    entry[Entry.AUTHOR],
-                    entry[Entry.DATE],
-                    lines[0],
-                    entry[Entry.CUSTOM_ID],
-                    entry_str,
-                ),
-            )
-            for line in lines[1:]:
-                treeview_data.insert(line_item, tk.END, text="", values=("", "", line))
+    def load_git_log_bodies(indexes):
+        """load messages of entries fetched without body"""
+        store = git_log_entries["data"]
+        try:
+            loaded = git_log_fetch["bodies"].load([store[i] for i in indexes])
+        except GitLogError as e:
+            messagebox.showerror("Error", f"Failed to load messages: {e}")
+            return
+        if loaded:
+            # words and orders of store take messages with body
+            loaded = {id(entry) for entry in loaded}
+            store.update(i for i in indexes if id(store[i]) in loaded)
 
     def cb_append_to_report():
         """append item from treeview to report"""
 
-        selected = treeview_data.selection()
+        selected = git_log_view.get_selected()
         if not selected:
             return
 
-        report_logs = []
-        for sel in selected:
-            # TODO: add parent if it was not already selected
-            if treeview_data.parent(sel):
-                continue
-
-            item = treeview_data.item(sel)
-            values = item["values"]
-            entry = json.loads(values[-1])
-            report_logs.append(entry)
-
+        load_git_log_bodies(selected)
+        store = git_log_entries["data"]
         report_entry_log_format = var_entry_log_format.get()
-        for report in report_logs:
+        for index in selected:
             report_text.insert(
-                tk.END,
-                report_entry_log_format.format(**report).replace(r"\n", "\n"),
+                tk.END, render_entry(store[index], report_entry_log_format)
             )
 
-    config = Config.DEF_CONFIG.copy()
-    for cfg in get_all_configs():
-        config[cfg.name] = cfg.value
+    # create tables added after DB was initialized
+    create_tables()
+
+    config = get_config()
 
     root = tk.Tk()
     root.geometry("1600x600")
     root.title("CWPL generator")
+    root.protocol("WM_DELETE_WINDOW", cb_close)
 
     # create tab control
     tab_control = ttk.Notebook(master=root)
@@ -380,6 +499,10 @@ def show():
 
     tab_control.add(report_tab, text="Report")
     tab_control.add(config_tab, text="Config")
+
+    # time of stages of last fetch
+    status_bar = tk.Label(master=root, anchor=tk.W, relief=tk.SUNKEN)
+    status_bar.pack(side=tk.BOTTOM, fill=tk.X)
     tab_control.pack(fill=tk.BOTH, expand=True)
 
     config_tab.columnconfigure(0, weight=1)
@@ -393,6 +516,8 @@ def show():
 
     tk.Button(master=folders_frame, text="+", command=cb_add_folder).pack()
     tk.Button(master=folders_frame, text="-", command=cb_del_folder).pack()
+    scan_button = tk.Button(master=folders_frame, text="scan", command=cb_scan_folders)
+    scan_button.pack()
 
     folders_frame.grid(row=0, column=0, sticky=tk.NSEW)
 
@@ -424,11 +549,7 @@ def show():
             if new_value == old_value:
                 return
 
-            if not update_config_by_name(config_name, new_value):
-                tk.messagebox.showerror("Error", "Failed to update config")
-                var_value.set(old_value)
-                return
-            config[config_name] = new_value
+            save_config(config_name, new_value)
 
         def cb_set_default():
             var_value.set(default_value)
@@ -469,11 +590,7 @@ def show():
             if new_value == old_value:
                 return
 
-            if not update_config_by_name(config_name, new_value):
-                tk.messagebox.showerror("Error", "Failed to update config")
-                var_value.set(old_value)
-                return
-            config[config_name] = new_value
+            save_config(config_name, new_value)
 
         def cb_set_default():
             var_value.set(ConfBool.from_string(default_value).int())
@@ -504,7 +621,7 @@ def show():
                 return False
             entity_val = json.loads(str_value[:-1])
             existing_keys = set(entity_val.keys())
-            expected_keys = set(Entry.get_keys(Entry))
+            expected_keys = set(Entry.KEYS)
             return expected_keys.issubset(existing_keys)
         except Exception as e:
             print(e)
@@ -520,6 +637,81 @@ def show():
         validator_cb=edit_git_log_validator,
     )
 
+    settings_frame_row_idx += 1
+    var_git_log_use_format, _ = create_config_ui_bool(
+        settings_frame,
+        "use git log format: ",
+        settings_frame_row_idx,
+        Config.DEF_GIT_LOG_USE_FORMAT,
+        Config.DEF_GIT_LOG_USE_FORMAT_VALUE,
+    )
+
+    settings_frame_row_idx += 1
+    var_git_log_cache, _ = create_config_ui_bool(
+        settings_frame,
+        "cache git log: ",
+        settings_frame_row_idx,
+        Config.DEF_GIT_LOG_CACHE,
+        Config.DEF_GIT_LOG_CACHE_VALUE,
+    )
+
+    settings_frame_row_idx += 1
+    var_git_log_lazy_bodies, lazy_bodies_cb = create_config_ui_bool(
+        settings_frame,
+        "load messages on demand (without cache): ",
+        settings_frame_row_idx,
+        Config.DEF_GIT_LOG_LAZY_BODIES,
+        Config.DEF_GIT_LOG_LAZY_BODIES_VALUE,
+    )
+
+    def on_toggle_git_log_cache():
+        # commit cache keeps full messages, they are not loaded on demand
+        state = tk.DISABLED if var_git_log_cache.get() else tk.NORMAL
+        lazy_bodies_cb.config(state=state)
+
+    var_git_log_cache.trace_add("write", lambda *args: on_toggle_git_log_cache())
+    on_toggle_git_log_cache()
+
+    settings_frame_row_idx += 1
+    var_git_log_workers, _ = create_config_ui(
+        settings_frame,
+        "git log workers: ",
+        settings_frame_row_idx,
+        Config.DEF_GIT_LOG_WORKERS,
+        Config.DEF_GIT_LOG_WORKERS_VALUE,
+        validator_cb=lambda str_value: str_value.isdigit() and int(str_value) > 0,
+    )
+
+    settings_frame_row_idx += 1
+    var_transform_workers, _ = create_config_ui(
+        settings_frame,
+        "transform processes: ",
+        settings_frame_row_idx,
+        Config.DEF_TRANSFORM_WORKERS,
+        Config.DEF_TRANSFORM_WORKERS_VALUE,
+        validator_cb=lambda str_value: str_value.isdigit(),
+    )
+
+    settings_frame_row_idx += 1
+    var_transform_chunk_size, _ = create_config_ui(
+        settings_frame,
+        "transform chunk size: ",
+        settings_frame_row_idx,
+        Config.DEF_TRANSFORM_CHUNK_SIZE,
+        Config.DEF_TRANSFORM_CHUNK_SIZE_VALUE,
+        validator_cb=lambda str_value: str_value.isdigit() and int(str_value) > 0,
+    )
+
+    settings_frame_row_idx += 1
+    var_git_log_backend, _ = create_config_ui(
+        settings_frame,
+        "git log backend: ",
+        settings_frame_row_idx,
+        Config.DEF_GIT_LOG_BACKEND,
+        Config.DEF_GIT_LOG_BACKEND_VALUE,
+        validator_cb=lambda str_value: str_value in LOG_BACKENDS,
+    )
+
     settings_frame_row_idx += 1
     var_git_log_in_branches, _ = create_config_ui_bool(
         settings_frame,
@@ -533,7 +725,8 @@ def show():
         try:
             entity_str = var_git_log_format.get()
             entity_val = json.loads(entity_str[:-1])
-            s = str_value.format(Entry, **entity_val)
+            custom_ids = {name: "" for name, _ in custom_id_rules["rules"]}
+            s = str_value.format(Entry, **{**custom_ids, **entity_val})
             return True
         except Exception as e:
             print(e)
@@ -560,14 +753,19 @@ def show():
 
     def on_toggle_show_custom_id_column():
         show = var_entry_show_custom_id.get()
-        if show:
-            treeview_data.column(
-                Entry.CUSTOM_ID, minwidth=0, width=340, stretch=tk.NO, anchor=tk.E
-            )
-        else:
-            treeview_data.column(
-                Entry.CUSTOM_ID, minwidth=0, width=0, stretch=tk.NO, anchor=tk.E
-            )
+        columns = [Entry.CUSTOM_ID] + [
+            CUSTOM_ID_COLUMN_PREFIX + name for name, _ in custom_id_rules["rules"]
+        ]
+        for column in columns:
+            if show:
+                width = 340 if column == Entry.CUSTOM_ID else 120
+                treeview_data.column(
+                    column, minwidth=0, width=width, stretch=tk.NO, anchor=tk.E
+                )
+            else:
+                treeview_data.column(
+                    column, minwidth=0, width=0, stretch=tk.NO, anchor=tk.E
+                )
 
     var_entry_show_custom_id.trace_add(
         "write", lambda *args: on_toggle_show_custom_id_column()
@@ -576,6 +774,24 @@ def show():
     settings_frame.grid(row=2, column=0, sticky=tk.NSEW)
     settings_frame.columnconfigure(1, weight=1)
 
+    # custom ID rules frame
+    rules_frame = tk.LabelFrame(
+        master=config_tab, height=200, text=" custom ID rules (name, pattern): "
+    )
+    __rule_panel = tk.Frame(master=rules_frame)
+    rule_name_entry = tk.Entry(master=__rule_panel, width=20)
+    rule_name_entry.pack(side=tk.LEFT)
+    rule_pattern_entry = tk.Entry(master=__rule_panel)
+    rule_pattern_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+    __rule_panel.pack(side=tk.TOP, fill=tk.X)
+    rules_list = tk.Listbox(master=rules_frame, selectmode=tk.SINGLE, height=4)
+    rules_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    tk.Button(master=rules_frame, text="+", command=cb_add_custom_id_rule).pack()
+    tk.Button(master=rules_frame, text="-", command=cb_del_custom_id_rule).pack()
+
+    rules_frame.grid(row=3, column=0, sticky=tk.NSEW)
+
     # TODO: remove?
     # filler tab in the bottom
     # tk.Frame(master=config_tab).pack(side=tk.BOTTOM, expand=True, fill=tk.BOTH)
@@ -595,37 +811,109 @@ def show():
         day=dt.day,
     )
     data_calendar.grid(row=0, column=0)
-    tk.Button(
+
+    # end of range and commits since previous report
+    __range_panel = tk.Frame(master=data_frame)
+    var_use_before = tk.IntVar(value=0)
+    tk.Checkbutton(
+        master=__range_panel,
+        text="before: ",
+        variable=var_use_before,
+        command=lambda: before_entry.config(
+            state="readonly" if var_use_before.get() else tk.DISABLED
+        ),
+    ).pack(side=tk.LEFT)
+    before_entry = DateEntry(
+        master=__range_panel, date_pattern=r"y-mm-dd", state=tk.DISABLED
+    )
+    before_entry.pack(side=tk.LEFT)
+    var_since_last = tk.IntVar(value=0)
+    tk.Checkbutton(
+        master=__range_panel, text="since last report", variable=var_since_last
+    ).pack(side=tk.LEFT)
+    __range_panel.grid(row=1, column=0, sticky=tk.W)
+
+    fetch_button = tk.Button(
         master=data_frame, text="FETCH GIT LOG", command=cb_get_git_log_data
-    ).grid(row=1, column=0, sticky=tk.NW)
+    )
+    fetch_button.grid(row=2, column=0, sticky=tk.NW)
+
+    # progress of fetching
+    __fetch_panel = tk.Frame(master=data_frame)
+    cancel_button = tk.Button(
+        master=__fetch_panel,
+        text="CANCEL",
+        command=cb_cancel_git_log_fetch,
+        state=tk.DISABLED,
+    )
+    cancel_button.pack(side=tk.LEFT)
+    fetch_progress = ttk.Progressbar(master=__fetch_panel, mode="determinate")
+    fetch_progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
+    __fetch_panel.grid(row=3, column=0, sticky=tk.EW)
+    fetch_status_list = tk.Listbox(master=data_frame, height=5)
+    fetch_status_list.grid(row=4, column=0, sticky=tk.NSEW)
 
     def _g_cb(name):
         return lambda: set_columns_sort(name)
 
-    treeview_data = ttk.Treeview(
-        master=data_frame,
-        columns=(Entry.AUTHOR, Entry.DATE, Entry.MESSAGE, Entry.CUSTOM_ID),
-    )
-    treeview_data.heading("#0", text="Commit", command=_g_cb(Entry.COMMIT))
-    treeview_data.column("#0", minwidth=0, width=300, stretch=tk.NO)
-    treeview_data.heading(Entry.AUTHOR, text="Author", command=_g_cb(Entry.AUTHOR))
-    treeview_data.column(Entry.AUTHOR, minwidth=0, width=200, stretch=tk.NO)
-    treeview_data.heading(Entry.DATE, text="Date", command=_g_cb(Entry.DATE))
-    treeview_data.column(Entry.DATE, minwidth=0, width=200, stretch=tk.NO)
-    treeview_data.heading(Entry.MESSAGE, text="Message", command=_g_cb(Entry.MESSAGE))
-    treeview_data.heading(
-        Entry.CUSTOM_ID, text="Custom ID", command=_g_cb(Entry.CUSTOM_ID)
-    )
-    on_toggle_show_custom_id_column()
+    def set_treeview_data_columns():
+        """set columns of entry fields and of each custom ID rule"""
 
-    treeview_data.grid(row=0, column=1, rowspan=2, sticky=tk.NSEW)
+        custom_id_columns = [
+            (CUSTOM_ID_COLUMN_PREFIX + name, name)
+            for name, _ in custom_id_rules["rules"]
+        ]
+        # settings of columns are reset
+        treeview_data.configure(
+            columns=(
+                Entry.AUTHOR,
+                Entry.DATE,
+                Entry.MESSAGE,
+                Entry.CUSTOM_ID,
+                *[column for column, _ in custom_id_columns],
+            )
+        )
+        treeview_data.heading("#0", text="Commit", command=_g_cb(Entry.COMMIT))
+        treeview_data.column("#0", minwidth=0, width=300, stretch=tk.NO)
+        treeview_data.heading(Entry.AUTHOR, text="Author", command=_g_cb(Entry.AUTHOR))
+        treeview_data.column(Entry.AUTHOR, minwidth=0, width=200, stretch=tk.NO)
+        treeview_data.heading(Entry.DATE, text="Date", command=_g_cb(Entry.DATE))
+        treeview_data.column(Entry.DATE, minwidth=0, width=200, stretch=tk.NO)
+        treeview_data.heading(
+            Entry.MESSAGE, text="Message", command=_g_cb(Entry.MESSAGE)
+        )
+        treeview_data.heading(
+            Entry.CUSTOM_ID, text="Custom ID", command=_g_cb(Entry.CUSTOM_ID)
+        )
+        for column, name in custom_id_columns:
+            treeview_data.heading(column, text=name, command=_g_cb(column))
+        on_toggle_show_custom_id_column()
+
+    treeview_data = ttk.Treeview(master=data_frame)
+
+    treeview_data.grid(row=0, column=1, rowspan=5, sticky=tk.NSEW)
 
     def create_vs(master, owner):
         vs = ttk.Scrollbar(master, orient=tk.VERTICAL, command=owner.yview)
         owner.configure(yscrollcommand=vs.set)
         return vs
 
-    create_vs(data_frame, treeview_data).grid(row=0, column=2, rowspan=2, sticky=tk.NS)
+    treeview_data_vs = ttk.Scrollbar(data_frame, orient=tk.VERTICAL)
+    treeview_data_vs.grid(row=0, column=2, rowspan=5, sticky=tk.NS)
+    # only visible rows are inserted into treeview
+    git_log_view = VirtualTreeview(
+        treeview_data, treeview_data_vs, get_git_log_row, load=load_git_log_bodies
+    )
+
+    # filter of entries by words of message, author and custom IDs
+    __search_panel = tk.Frame(master=data_frame)
+    tk.Label(master=__search_panel, text="search: ").pack(side=tk.LEFT)
+    var_search = tk.StringVar()
+    tk.Entry(master=__search_panel, textvariable=var_search).pack(
+        side=tk.LEFT, fill=tk.X, expand=True
+    )
+    var_search.trace_add("write", lambda *args: sort_git_log_data_tv())
+    __search_panel.grid(row=5, column=1, sticky=tk.EW)
 
     # TODO: remove panel?
     __date_btn_panel = tk.Frame(master=data_frame)
@@ -658,6 +946,11 @@ def show():
         text="CLEAR",
         command=lambda: report_text.delete("1.0", tk.END),
     ).grid(row=0, column=2, sticky=tk.S)
+    tk.Button(
+        master=report_frame,
+        text="REPORT DONE",
+        command=cb_report_done,
+    ).grid(row=0, column=3, sticky=tk.S)
     # tk.Frame(master=report_frame).pack(side=tk.LEFT, anchor=tk.W, expand=True, fill=tk.BOTH)
 
     report_frame.pack(side=tk.TOP, expand=True, fill=tk.BOTH)
@@ -668,5 +961,7 @@ def show():
     list_all_folders()
     # Update list of users
     list_all_users()
+    # Update list of custom ID rules and columns of treeview
+    list_all_custom_id_rules()
 
     root.mainloop()
@@ -0,0 +1,168 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+# state mask of Shift and Control modifiers
+_MODIFIERS_MASK = 0x0001 | 0x0004
+
+
+class VirtualTreeview:
+    """Window over list of entries shown by ttk.Treeview
+
+    Only visible entries are inserted into treeview, their message lines
+    are inserted as children when item is opened.
+    Id of top level item is index of entry in list of entries.
+
+    get_row(entry) returns (text, values, lines) of entry,
+    lines are shown as children of item.
+    load(indexes) is called before lines of entries are shown,
+    e.g. to load their messages.
+    """
+
+    def __init__(self, treeview, scrollbar, get_row, load=None):
+        self.treeview = treeview
+        self.scrollbar = scrollbar
+        self.get_row = get_row
+        self.load = load
+
+        self.entries = []
+        # indexes of entries in order of view
+        self.order = []
+        # index of first visible entry in order
+        self.offset = 0
+        self.visible = []
+        self.selected = set()
+        self.opened = set()
+
+        scrollbar.configure(command=self.yview)
+        treeview.bind("<<TreeviewSelect>>", self._on_select)
+        treeview.bind("<<TreeviewOpen>>", self._on_open)
+        treeview.bind("<<TreeviewClose>>", self._on_close)
+        treeview.bind("<ButtonPress-1>", self._on_click, add="+")
+        treeview.bind("<MouseWheel>", self._on_mouse_wheel)
+        treeview.bind("<Button-4>", lambda event: self._scroll(-1))
+        treeview.bind("<Button-5>", lambda event: self._scroll(1))
+        treeview.bind("<Configure>", lambda event: self.refresh())
+
+    def set_entries(self, entries):
+        self.entries = entries
+        self.order = list(range(len(entries)))
+        self.offset = 0
+        self.selected = set()
+        self.opened = set()
+        self.refresh()
+
+    def set_order(self, order):
+        """show entries in order of indexes, order is not modified"""
+        self.order = order
+        self.refresh()
+
+    def get_selected(self):
+        """Returns indexes of selected entries in order of view"""
+        return [i for i in self.order if i in self.selected]
+
+    def refresh(self):
+        treeview = self.treeview
+        treeview.delete(*treeview.get_children())
+
+        rows = self._rows()
+        self.offset = max(0, min(self.offset, len(self.order) - rows))
+        self.visible = self.order[self.offset : self.offset + rows]
+        for index in self.visible:
+            self._insert(index)
+        treeview.selection_set([str(i) for i in self.visible if i in self.selected])
+
+        total = len(self.order)
+        if total:
+            self.scrollbar.set(
+                self.offset / total, (self.offset + len(self.visible)) / total
+            )
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """scrollbar command"""
+        if args[0] == tk.MOVETO:
+            self._set_offset(int(float(args[1]) * len(self.order)))
+        elif args[0] == tk.SCROLL:
+            step = int(args[1])
+            if args[2] == tk.PAGES:
+                step *= self._rows()
+            self._scroll(step)
+
+    def _rows(self):
+        """number of rows which fit into treeview"""
+        rows = int(self.treeview.cget("height"))
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        height = self.treeview.winfo_height()
+        if row_height and height > 1:
+            # without heading
+            rows = max(rows, height // int(row_height) - 1)
+        return rows
+
+    def _scroll(self, step):
+        self._set_offset(self.offset + step)
+        return "break"
+
+    def _set_offset(self, offset):
+        offset = max(0, min(offset, len(self.order) - self._rows()))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _insert(self, index):
+        text, values, lines = self.get_row(self.entries[index])
+        iid = str(index)
+        is_open = index in self.opened
+        self.treeview.insert("", tk.END, iid=iid, text=text, values=values)
+        if not lines:
+            return
+        if is_open:
+            self._insert_lines(iid, lines)
+            self.treeview.item(iid, open=True)
+        else:
+            # placeholder to show that item can be opened
+            self.treeview.insert(iid, tk.END, iid=f"{iid}.", text="")
+
+    def _insert_lines(self, iid, lines):
+        for n, line in enumerate(lines):
+            self.treeview.insert(
+                iid, tk.END, iid=f"{iid}.{n}", text="", values=("", "", line)
+            )
+
+    def _on_open(self, event):
+        iid = self.treeview.focus()
+        if not iid or self.treeview.parent(iid):
+            return
+        index = int(iid)
+        self.opened.add(index)
+        placeholder = f"{iid}."
+        if self.treeview.exists(placeholder):
+            self.treeview.delete(placeholder)
+            if self.load:
+                self.load([index])
+            _, _, lines = self.get_row(self.entries[index])
+            self._insert_lines(iid, lines)
+
+    def _on_close(self, event):
+        iid = self.treeview.focus()
+        if iid and not self.treeview.parent(iid):
+            self.opened.discard(int(iid))
+
+    def _on_click(self, event):
+        # plain click replaces selection, also of entries out of view
+        region = self.treeview.identify_region(event.x, event.y)
+        element = self.treeview.identify_element(event.x, event.y)
+        if region not in ("tree", "cell") or "indicator" in element:
+            return
+        if not event.state & _MODIFIERS_MASK:
+            self.selected.clear()
+
+    def _on_select(self, event):
+        selection = {int(iid) for iid in self.treeview.selection() if "." not in iid}
+        self.selected.difference_update(self.visible)
+        self.selected.update(selection)
+
+    def _on_mouse_wheel(self, event):
+        step = -1 if event.delta > 0 else 1
+        return self._scroll(step * max(1, abs(event.delta) // 120))
@@ -3,8 +3,6 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 import click
-from db import db
-from ui import launch_server
 
 
 @click.group(invoke_without_command=True)
@@ -19,6 +17,8 @@ def cli(ctx):
 def init_db():
     """initialize DB on first run"""
 
+    from db import db
+
     print("Initialize DB!")
     db.init_db()
 
@@ -27,6 +27,9 @@ def init_db():
 def run():
     """run Job Applications Memo UI [DEFAULT]"""
 
+    # gradio is slow to import, it is loaded only to run UI
+    from ui import launch_server
+
     print("Run!")
     launch_server()
 
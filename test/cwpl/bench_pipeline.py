@@ -0,0 +1,181 @@
+"""Benchmarks of stages of git log pipeline on synthetic repositories
+
+They are not collected by default, run them with:
+
+    python -m pytest test/cwpl/bench_pipeline.py --benchmark-autosave
+
+and compare saved JSON results of versions with --benchmark-compare.
+"""
+
+from operator import attrgetter
+import pytest
+import cwpl.engine as engine
+import cwpl.gitlog as gitlog
+from cwpl.backend import get_log_backend
+from cwpl.db import Config
+from cwpl.report import render_entry
+
+AFTER = "2000-01-01"
+AUTHORS = (
+    "Test User <test@example.com>",
+    "Other User <other@example.com>",
+    "Third User <third@example.com>",
+    "Fourth User <fourth@example.com>",
+)
+AUTHOR = "Test User"
+
+# (commits, message size, branches) of synthetic repositories
+REPOS = [
+    (1000, 200, 1),
+    (10000, 200, 1),
+    (10000, 2000, 1),
+    (10000, 200, 8),
+]
+
+
+@pytest.fixture(
+    scope="module",
+    params=REPOS,
+    ids=lambda p: "commits={}-message={}-branches={}".format(*p),
+)
+def synthetic_repo(request, tmp_path_factory, make_synthetic_repo):
+    commits, message_size, branches = request.param
+    folder = str(tmp_path_factory.mktemp("repo"))
+    return make_synthetic_repo(
+        folder, commits, message_size, authors=AUTHORS, branches=branches
+    )
+
+
+@pytest.fixture(scope="module")
+def entries(synthetic_repo):
+    return [
+        gitlog.transform_log_entry(entry, Config.DEF_DATE_FORMAT_VALUE)
+        for entry in gitlog.fetch_git_log_delimited(synthetic_repo, AFTER, "*")
+    ]
+
+
+def _info(benchmark, entries):
+    benchmark.extra_info["entries"] = len(entries)
+    benchmark.extra_info["message_bytes"] = sum(len(e.message) for e in entries)
+
+
+def test_git_log_delimited(benchmark, synthetic_repo):
+    benchmark.group = "git log"
+    res = benchmark(gitlog.fetch_git_log_delimited, synthetic_repo, AFTER, "*")
+    _info(benchmark, res)
+
+
+def test_git_log_pygit2(benchmark, synthetic_repo):
+    pytest.importorskip("pygit2")
+    benchmark.group = "git log"
+    backend = get_log_backend("pygit2")
+    after = engine.date_to_timestamp(AFTER)
+    res = benchmark(backend.fetch_log, synthetic_repo, after, "*")
+    _info(benchmark, res)
+
+
+def test_git_log_json(benchmark, synthetic_repo):
+    benchmark.group = "git log"
+    res = benchmark(
+        gitlog.fetch_git_log,
+        synthetic_repo,
+        AFTER,
+        Config.DEF_GIT_LOG_FORMAT_VALUE,
+        "*",
+    )
+    _info(benchmark, res)
+
+
+def test_authors_by_git(benchmark, synthetic_repo):
+    benchmark.group = "authors"
+    res = benchmark(
+        gitlog.fetch_git_log_delimited, synthetic_repo, AFTER, "*", authors=[AUTHOR]
+    )
+    _info(benchmark, res)
+
+
+def test_authors_cache_fill(benchmark, synthetic_repo, cwpl_db):
+    # commits of all authors are read into empty commit cache
+    benchmark.group = "authors"
+    after = engine.date_to_timestamp(AFTER)
+
+    def setup():
+        cwpl_db.delete_paths_by_folder(synthetic_repo)
+        cwpl_db.add_path(synthetic_repo)
+
+    res = benchmark.pedantic(
+        engine.fetch_git_log_cached,
+        args=(synthetic_repo, after),
+        kwargs={"branches": "*", "authors": [AUTHOR]},
+        setup=setup,
+        rounds=5,
+    )
+    _info(benchmark, res)
+
+
+def test_authors_cache_hit(benchmark, synthetic_repo, cwpl_db):
+    # nothing changed since previous fetch, authors are selected by DB
+    benchmark.group = "authors"
+    after = engine.date_to_timestamp(AFTER)
+    cwpl_db.add_path(synthetic_repo)
+    engine.fetch_git_log_cached(synthetic_repo, after, branches="*")
+
+    res = benchmark(
+        engine.fetch_git_log_cached,
+        synthetic_repo,
+        after,
+        branches="*",
+        authors=[AUTHOR],
+    )
+    _info(benchmark, res)
+
+
+def test_authors_by_matcher(benchmark, synthetic_repo, entries):
+    benchmark.group = "authors"
+    is_author = gitlog.make_author_matcher([AUTHOR])
+    res = benchmark(lambda: [e for e in entries if is_author(e.author)])
+    _info(benchmark, res)
+
+
+def test_transform(benchmark, entries):
+    benchmark.group = "transform"
+    date_format = Config.DEF_DATE_FORMAT_VALUE
+    benchmark(lambda: [gitlog.transform_log_entry(e, date_format) for e in entries])
+    _info(benchmark, entries)
+
+
+def test_dedup(benchmark, synthetic_repo, entries):
+    benchmark.group = "dedup"
+    # the same repository cloned twice
+    repo_logs = [engine.RepoLog(synthetic_repo, entries, None)] * 2
+    res, _ = benchmark(engine.dedup_repo_logs, repo_logs)
+    _info(benchmark, res)
+
+
+def test_sort(benchmark, entries):
+    benchmark.group = "sort"
+    key = attrgetter(gitlog.Entry.DATE_PARSED)
+    benchmark(sorted, entries, key=key, reverse=True)
+    _info(benchmark, entries)
+
+
+def test_render(benchmark, entries):
+    benchmark.group = "render"
+    entry_log_format = Config.DEF_ENTRY_LOG_FORMAT_VALUE
+    benchmark(lambda: "".join(render_entry(e, entry_log_format) for e in entries))
+    _info(benchmark, entries)
+
+
+def test_fetch_entries(benchmark, synthetic_repo):
+    benchmark.group = "pipeline"
+    # entries of the second folder are dropped as duplicates
+    folders = [synthetic_repo, synthetic_repo]
+    repo_logs, _ = benchmark(
+        engine.fetch_entries,
+        folders,
+        AFTER,
+        Config.DEF_DATE_FORMAT_VALUE,
+        branches="*",
+        authors=[AUTHOR],
+    )
+    _info(benchmark, engine.merge_repo_logs(repo_logs))
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import pytest
+
+
+def _make_repo(folder, messages, author="Test User <test@example.com>"):
+    """Create git repository with commit per message"""
+
+    name, email = author[:-1].split(" <")
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME=name,
+        GIT_AUTHOR_EMAIL=email,
+        GIT_COMMITTER_NAME=name,
+        GIT_COMMITTER_EMAIL=email,
+    )
+    if not os.path.exists(os.path.join(folder, ".git")):
+        subprocess.run(["git", "init", "-q", folder], check=True)
+    for message in messages:
+        subprocess.run(
+            ["git", "-C", folder, "commit", "-q", "--allow-empty", "-m", message],
+            check=True,
+            env=env,
+        )
+    return folder
+
+
+def _make_synthetic_repo(
+    folder,
+    commits,
+    message_size=200,
+    authors=("Test User <test@example.com>",),
+    branches=1,
+):
+    """Create git repository with generated commits by git fast-import
+
+    Commits are split between branches, authors take turns, message has
+    subject, body of message_size characters and Change-Id.
+    Branches fork from the same commit of master, commits are made
+    a minute apart since 2020-01-01.
+    """
+
+    subprocess.run(["git", "init", "-q", folder], check=True)
+    subprocess.run(
+        ["git", "-C", folder, "symbolic-ref", "HEAD", "refs/heads/master"], check=True
+    )
+
+    text = "lorem ipsum dolor sit amet consectetur adipiscing elit "
+    body = (text * (message_size // len(text) + 1))[:message_size]
+
+    stream = []
+    per_branch = max(1, commits // branches)
+    for n in range(commits):
+        branch = min(n // per_branch, branches - 1)
+        ref = "refs/heads/master" if branch == 0 else f"refs/heads/branch{branch}"
+        author = authors[n % len(authors)]
+        timestamp = 1577836800 + n * 60
+        message = f"commit {n}\n\n{body}\n\nChange-Id: I{n:040x}\n"
+        stream.append(f"commit {ref}\nmark :{n + 1}\n")
+        stream.append(f"author {author} {timestamp} +0000\n")
+        stream.append(f"committer {author} {timestamp} +0000\n")
+        stream.append(f"data {len(message.encode('utf-8'))}\n{message}")
+        if branch and n == branch * per_branch:
+            # branches fork from the middle of master
+            stream.append(f"from :{max(1, per_branch // 2)}\n")
+        stream.append("\n")
+
+    subprocess.run(
+        ["git", "-C", folder, "fast-import", "--quiet"],
+        input="".join(stream).encode("utf-8"),
+        check=True,
+    )
+    return folder
+
+
+@pytest.fixture
+def make_repo():
+    return _make_repo
+
+
+@pytest.fixture(scope="session")
+def make_synthetic_repo():
+    return _make_synthetic_repo
+
+
+@pytest.fixture
+def cwpl_db(tmp_path, monkeypatch):
+    """DB of cwpl modules in temporary file"""
+
+    # path of cwpl modules is added by import of cwpl package in tests
+    import db
+
+    monkeypatch.setattr(
+        db, "sql_engine", db.make_engine(f"sqlite:///{tmp_path}/cwpl.sqlite")
+    )
+    db.init_db()
+    return db
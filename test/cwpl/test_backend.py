@@ -0,0 +1,108 @@
+import os
+import subprocess
+import pytest
+import cwpl.engine as engine
+from cwpl.backend import LOG_BACKENDS, get_log_backend
+
+pygit2 = pytest.importorskip("pygit2")
+
+AUTHORS = ("Test User <test@example.com>", "Other User <other@example.com>")
+
+
+@pytest.fixture(scope="module")
+def synthetic_repo(tmp_path_factory, make_synthetic_repo):
+    folder = str(tmp_path_factory.mktemp("repo"))
+    make_synthetic_repo(folder, 200, 100, authors=AUTHORS, branches=3)
+    with open(f"{folder}/.mailmap", "w") as f:
+        f.write("Mapped User <mapped@example.com> <other@example.com>\n")
+    return folder
+
+
+def _fetch(backend, folder, **kwargs):
+    after = engine.date_to_timestamp("2020-01-01T01:00:00+00:00")
+    return sorted(
+        (e.commit, e.author, e.date, e.timestamp, e.message)
+        for e in backend.fetch_log(folder, after, **kwargs)
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"branches": "*"},
+        {"branches": "branch[12]"},
+        {"authors": ["Mapped"]},
+        {"before": engine.date_to_timestamp("2020-01-01T02:00:00+00:00")},
+    ],
+)
+def test_pygit2_backend(synthetic_repo, kwargs):
+    git_entries = _fetch(get_log_backend("git"), synthetic_repo, **kwargs)
+    pygit2_entries = _fetch(get_log_backend("pygit2"), synthetic_repo, **kwargs)
+
+    assert git_entries
+    assert pygit2_entries == git_entries
+
+
+def test_pygit2_backend_refs(synthetic_repo):
+    git, backend = LOG_BACKENDS["git"], LOG_BACKENDS["pygit2"]
+    tips = backend.get_ref_tips(synthetic_repo, "*")
+
+    assert tips == git.get_ref_tips(synthetic_repo, "*")
+    assert backend.get_ref_tips(synthetic_repo) == git.get_ref_tips(synthetic_repo)
+    master = tips["refs/heads/master"]
+    first = subprocess.run(
+        ["git", "-C", synthetic_repo, "rev-list", "--max-parents=0", master],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    assert backend.is_ancestor(synthetic_repo, first, master)
+    assert not backend.is_ancestor(synthetic_repo, master, first)
+    assert not backend.is_ancestor(synthetic_repo, "0" * 40, master)
+
+
+def test_pygit2_backend_encoding(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    message = tmp_path / "message"
+    message.write_bytes("привіт\n".encode("cp1251"))
+    subprocess.run(
+        ["git", "-C", repo, "-c", "i18n.commitEncoding=cp1251", "commit", "-q"]
+        + ["--allow-empty", "-F", str(message)],
+        check=True,
+        env=dict(
+            os.environ,
+            GIT_AUTHOR_NAME="Test User",
+            GIT_AUTHOR_EMAIL="test@example.com",
+            GIT_COMMITTER_NAME="Test User",
+            GIT_COMMITTER_EMAIL="test@example.com",
+        ),
+    )
+    after = engine.date_to_timestamp("2000-01-01")
+
+    entries = get_log_backend("pygit2").fetch_log(repo, after)
+
+    # message is decoded by encoding of commit like git does
+    assert [e.message for e in entries] == ["привіт\n", "first\n"]
+    assert _fetch(get_log_backend("pygit2"), repo) == _fetch(
+        get_log_backend("git"), repo
+    )
+
+
+def test_collect_git_logs_pygit2(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first", "second"])
+    folder = str(tmp_path / "folder")
+    subprocess.run(["git", "init", "-q", folder], check=True)
+
+    repo_logs = engine.collect_git_logs(
+        [repo, folder], "2000-01-01", log_backend="pygit2"
+    )
+
+    assert [e.message for e in repo_logs[0].entries] == ["second\n", "first\n"]
+    assert repo_logs[1].error is not None
+
+
+def test_get_log_backend():
+    assert get_log_backend().name == "git"
+    with pytest.raises(ValueError):
+        get_log_backend("svn")
@@ -0,0 +1,71 @@
+import cwpl.bodies as bodies
+import cwpl.engine as engine
+import cwpl.gitlog as gitlog
+from cwpl.db import Config
+
+
+def test_body_loader(tmp_path, make_repo, monkeypatch):
+    monkeypatch.setattr(bodies, "BODY_BATCH_SIZE", 2)
+    messages = ["first\n\nbody\n\nChange-Id: I1", "second", "third\n\nлист\n"]
+    repo = make_repo(str(tmp_path / "repo"), messages)
+    full = list(gitlog.iter_git_log(repo, "2000-01-01"))
+
+    entries = list(gitlog.iter_git_log(repo, "2000-01-01", subjects_only=True))
+    assert [e.message for e in entries] == ["third", "second", "first"]
+    assert all(e.subject_only for e in entries)
+
+    loader = bodies.BodyLoader(
+        lambda entry: gitlog.transform_log_entry(entry, Config.DEF_DATE_FORMAT_VALUE)
+    )
+    loader.add(repo, entries)
+    assert loader.load(entries[2:]) == entries[2:]
+    assert entries[2].custom_id == "I1"
+    assert entries[1].subject_only
+
+    assert loader.load(entries) == entries[:2]
+    assert [e.message for e in entries] == [e.message for e in full]
+    assert not any(e.subject_only for e in entries)
+    # loaded entries are not read again
+    assert loader.load(entries) == []
+    loader.close()
+
+
+def test_cat_file_batch(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    commit = gitlog.run_git(repo, ["rev-parse", "HEAD"]).strip()
+    batch = bodies.CatFileBatch(repo)
+
+    assert batch.read_messages([commit, "0" * 40]) == {commit: "first\n"}
+    # process is started again after close
+    batch.close()
+    assert batch.read_messages([commit]) == {commit: "first\n"}
+    batch.close()
+
+
+def test_parse_commit_message():
+    data = "tree 0\nencoding cp1251\n\nпривіт\n".encode("cp1251")
+    assert bodies.parse_commit_message(data) == "привіт\n"
+
+
+def test_collect_git_logs_subjects_only(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first\n\nbody"])
+
+    repo_logs = engine.collect_git_logs([repo], "2000-01-01", subjects_only=True)
+
+    assert [(e.message, e.subject_only) for e in repo_logs[0].entries] == [
+        ("first", True)
+    ]
+
+
+def test_collect_git_logs_subjects_only_cache(tmp_path, make_repo, cwpl_db):
+    repo = make_repo(str(tmp_path / "repo"), ["first\n\nbody"])
+    cwpl_db.add_path(repo)
+
+    repo_logs = engine.collect_git_logs(
+        [repo], "2000-01-01", use_cache=True, subjects_only=True
+    )
+
+    # commit cache keeps full messages
+    assert [(e.message, e.subject_only) for e in repo_logs[0].entries] == [
+        ("first\n\nbody\n", False)
+    ]
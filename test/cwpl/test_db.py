@@ -1,4 +1,5 @@
 import cwpl.db as db
+import pytest
 import sqlalchemy as sa
 
 
@@ -14,3 +15,68 @@ class BaseTestCase:
 class TestAddUser(BaseTestCase):
     def test_func_answer(self):
         assert db.add_user("test").name == "test"
+
+
+class TestCustomIdRules(BaseTestCase):
+    def test_rules(self):
+        assert [name for name, _ in db.get_custom_id_rules()] == list(
+            db.CustomIdRule.DEF_RULES
+        )
+
+        db.add_custom_id_rule("bug", r"bug-(\d+)")
+        assert db.get_custom_id_rules()[-1] == ("bug", r"bug-(\d+)")
+        assert db.delete_custom_id_rules_by_name("bug") == 1
+        assert len(db.get_custom_id_rules()) == len(db.CustomIdRule.DEF_RULES)
+
+
+class TestBulk(BaseTestCase):
+    def test_add_paths(self):
+        folders = [f"/work/repo{i}" for i in range(1000)]
+        assert db.add_paths(folders + folders[:10]) == folders
+        assert db.add_paths(folders[:10] + ["/work/new"]) == ["/work/new"]
+        assert len(db.get_all_paths()) == 1001
+
+    def test_add_users(self):
+        assert db.add_users(["a", "b", "a"]) == ["a", "b"]
+        assert db.add_users(["b", "c"]) == ["c"]
+
+    def test_update_configs(self):
+        db.update_configs({db.Config.DEF_DATE_FORMAT: "%Y", "new_config": "value"})
+        config = db.get_config()
+        assert config[db.Config.DEF_DATE_FORMAT] == "%Y"
+        assert config["new_config"] == "value"
+
+
+class TestReportCutoffs(BaseTestCase):
+    def test_update_report_cutoffs(self):
+        db.add_paths(["/work/a", "/work/b"])
+        db.update_report_cutoffs({"/work/a": 100, "/work/missing": 100})
+        assert db.get_report_cutoffs() == {"/work/a": 100}
+
+        db.update_report_cutoffs({"/work/a": 50, "/work/b": 200})
+        assert db.get_report_cutoffs() == {"/work/a": 100, "/work/b": 200}
+
+        assert db.delete_paths_by_folder("/work/b") == 1
+        assert db.get_report_cutoffs() == {"/work/a": 100}
+
+
+class TestUnitOfWork(BaseTestCase):
+    def test_commit_once(self):
+        with db.unit_of_work():
+            db.add_user("first")
+            db.add_user("second")
+        assert {"first", "second"} <= {u.name for u in db.get_all_users()}
+
+    def test_rollback(self):
+        with pytest.raises(RuntimeError):
+            with db.unit_of_work():
+                db.add_user("rolled back")
+                raise RuntimeError()
+        assert "rolled back" not in {u.name for u in db.get_all_users()}
+
+
+def test_make_engine_pragmas(tmp_path):
+    engine = db.make_engine(f"sqlite:///{tmp_path}/test.sqlite")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
@@ -0,0 +1,401 @@
+import subprocess
+import pytest
+import cwpl.engine as engine
+from cwpl.backend import get_log_backend
+from cwpl.db import Config
+from cwpl.gitlog import CancelToken, Entry
+
+
+@pytest.mark.parametrize("max_workers", [1, engine.DEF_MAX_WORKERS])
+def test_collect_git_logs(tmp_path, make_repo, max_workers):
+    repo_a = str(tmp_path / "a")
+    repo_b = str(tmp_path / "b")
+    missing = str(tmp_path / "missing")
+    make_repo(repo_a, ["first", "second"])
+    make_repo(repo_b, ["third"])
+
+    progress = []
+    repo_logs = engine.collect_git_logs(
+        [repo_a, missing, repo_b],
+        "2000-01-01",
+        Config.DEF_GIT_LOG_FORMAT_VALUE,
+        max_workers=max_workers,
+        on_progress=lambda repo_log, done, total: progress.append((done, total)),
+    )
+
+    assert [repo_log.folder for repo_log in repo_logs] == [repo_a, missing, repo_b]
+    assert len(repo_logs[0].entries) == 2
+    assert repo_logs[1].error is not None
+    assert len(repo_logs[2].entries) == 1
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+    messages = [e.message for e in engine.merge_repo_logs(repo_logs)]
+    assert messages == ["second\n", "first\n", "third\n"]
+
+
+class SpyBackend:
+    """Log backend which records entries read by wrapped backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.fetched = []
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def fetch_log(self, *args, **kwargs):
+        entries = self.backend.fetch_log(*args, **kwargs)
+        self.fetched.extend(entries)
+        return entries
+
+
+@pytest.mark.parametrize("log_backend", ["git", "pygit2"])
+def test_fetch_git_log_cached(tmp_path, make_repo, cwpl_db, log_backend):
+    if log_backend == "pygit2":
+        pytest.importorskip("pygit2")
+    repo = make_repo(str(tmp_path / "repo"), ["first", "second"])
+    cwpl_db.add_path(repo)
+    after = engine.date_to_timestamp("2000-01-01")
+    backend = SpyBackend(get_log_backend(log_backend))
+
+    entries = engine.fetch_git_log_cached(repo, after, backend=backend)
+    assert [e.message for e in entries] == ["second\n", "first\n"]
+
+    # nothing changed: no commits are read
+    backend.fetched = []
+    cached = engine.fetch_git_log_cached(repo, after, backend=backend)
+    assert backend.fetched == []
+    assert [e.as_dict() for e in cached] == [e.as_dict() for e in entries]
+
+    # only new commit is fetched
+    make_repo(repo, ["third"])
+    entries = engine.fetch_git_log_cached(repo, after, backend=backend)
+    assert [e.message for e in backend.fetched] == ["third\n"]
+    assert sorted(e.message for e in entries) == ["first\n", "second\n", "third\n"]
+
+    # rewritten history drops cache
+    subprocess.run(["git", "-C", repo, "reset", "-q", "--hard", "HEAD~2"], check=True)
+    make_repo(repo, ["rewritten"])
+    entries = engine.fetch_git_log_cached(repo, after, backend=backend)
+    assert sorted(e.message for e in entries) == ["first\n", "rewritten\n"]
+
+
+def test_fetch_result_cache():
+    def entries(*commits):
+        return [Entry(c, "author", "date", 0, f"msg {c}") for c in commits]
+
+    def commits(key):
+        cached = cache.get(key)
+        return cached and [entry.commit for entry in cached]
+
+    cache = engine.FetchResultCache(max_entries=3)
+    cache.put("a", entries("a1", "a2"))
+    cache.put("b", entries("b1"))
+    # too large result is not cached
+    cache.put("c", entries("c1", "c2", "c3", "c4"))
+
+    assert cache.get("c") is None
+    assert commits("a") == ["a1", "a2"]
+
+    # the least recently used result is dropped
+    cache.put("d", entries("d1"))
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    cache.put("a", entries("a3"))
+    cache.put("e", entries("e1"))
+    assert [commits(key) for key in "ade"] == [["a3"], ["d1"], ["e1"]]
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_fetch_result_cache_entries():
+    cache = engine.FetchResultCache()
+    entry = Entry("a", "author", "date", 10, "subject", {"refs": "main"})
+    entry.subject_only = True
+    cache.put("a", [entry])
+
+    # changes of fetched and cached entries are not shared
+    entry.message = "subject\n\nbody"
+    entry.subject_only = False
+    entry.extra["refs"] = "other"
+    cached = cache.get("a")
+    cached[0].custom_id = "ID-1"
+    cached[0].extra["refs"] = "changed"
+
+    cached = cache.get("a")
+    assert cached[0] is not entry
+    assert cached[0].as_dict() == {
+        "commit": "a",
+        "author": "author",
+        "date": "date",
+        "message": "subject",
+        "refs": "main",
+    }
+    assert cached[0].timestamp == 10
+    assert cached[0].subject_only
+    assert cached[0].custom_id == ""
+
+
+def test_collect_git_logs_results_cache(tmp_path, make_repo, monkeypatch):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    backend = SpyBackend(get_log_backend())
+    monkeypatch.setattr(engine, "get_log_backend", lambda name: backend)
+    cache = engine.FetchResultCache()
+
+    def messages(after="2000-01-01", **kwargs):
+        repo_logs = engine.collect_git_logs(
+            [repo], after, results_cache=cache, **kwargs
+        )
+        return [e.message for e in repo_logs[0].entries]
+
+    assert messages() == ["first\n"]
+    assert len(backend.fetched) == 1
+    # same fetch is not run again
+    assert messages() == ["first\n"]
+    assert len(backend.fetched) == 1
+
+    # changed parameters and refs are fetched
+    assert messages(authors=["Nobody"]) == []
+    assert messages(after="2030-01-01") == []
+    make_repo(repo, ["second"])
+    backend.fetched = []
+    assert messages() == ["second\n", "first\n"]
+    assert len(backend.fetched) == 2
+    assert len(cache) == 4
+
+
+def test_collect_git_logs_cache_fill(
+    tmp_path, make_synthetic_repo, cwpl_db, monkeypatch
+):
+    # writer does not wait for other ones
+    monkeypatch.setitem(cwpl_db.SQLITE_PRAGMAS, "busy_timeout", "0")
+    monkeypatch.setattr(
+        cwpl_db, "sql_engine", cwpl_db.make_engine(f"sqlite:///{tmp_path}/fill.sqlite")
+    )
+    cwpl_db.init_db()
+    repos = []
+    for n in range(8):
+        repos.append(make_synthetic_repo(str(tmp_path / f"repo{n}"), 500, 500))
+        cwpl_db.add_path(repos[-1])
+
+    # caches of all repositories are filled at the same time
+    repo_logs = engine.collect_git_logs(repos, "2000-01-01", use_cache=True)
+
+    assert [repo_log.error for repo_log in repo_logs] == [None] * 8
+    assert [len(repo_log.entries) for repo_log in repo_logs] == [500] * 8
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_collect_git_logs_authors(tmp_path, make_repo, cwpl_db, use_cache):
+    repo = str(tmp_path / "repo")
+    make_repo(repo, ["mine"], author="Me Myself <me@example.com>")
+    make_repo(repo, ["other"], author="Other <other@example.org>")
+    make_repo(repo, ["mine too"], author="Me Myself <me@example.com>")
+    cwpl_db.add_path(repo)
+
+    def messages(authors):
+        repo_logs = engine.collect_git_logs(
+            [repo], "2000-01-01", authors=authors, use_cache=use_cache
+        )
+        return sorted(e.message for e in engine.merge_repo_logs(repo_logs))
+
+    assert messages(None) == ["mine\n", "mine too\n", "other\n"]
+    assert messages([]) == []
+    assert messages(["Myself"]) == ["mine\n", "mine too\n"]
+    assert messages(["example.org", "nobody"]) == ["other\n"]
+    # substring match is case sensitive
+    assert messages(["myself"]) == []
+
+
+def test_dedup_repo_logs():
+    def entry(commit, message):
+        return Entry(commit, "author", "date", 0, message)
+
+    a1 = entry("a", "msg")
+    a2 = entry("a", "other msg")
+    b = entry("b", "msg")
+    repo_logs = [
+        engine.RepoLog("one", [a1, b, entry("a", "msg"), entry("a", "msg")], None),
+        engine.RepoLog("two", [entry("b", "msg"), a2, entry("a", "msg")], None),
+    ]
+
+    entries, dropped = engine.dedup_repo_logs(repo_logs)
+
+    assert entries == [a1, b, a2]
+    assert dropped == {"one": 2, "two": 2}
+
+
+def test_fetch_entries(tmp_path, make_repo):
+    repo_a = make_repo(str(tmp_path / "a"), ["first", "second"])
+    repo_b = str(tmp_path / "b")
+    subprocess.run(["git", "clone", "-q", repo_a, repo_b], check=True)
+    make_repo(repo_b, ["third"])
+
+    progress = []
+    repo_logs, dropped = engine.fetch_entries(
+        [repo_a, repo_b],
+        "2000-01-01",
+        Config.DEF_DATE_FORMAT_VALUE,
+        max_workers=1,
+        on_progress=lambda repo_log, done, total: progress.append(repo_log.folder),
+    )
+
+    assert progress == [repo_a, repo_b]
+    assert [len(repo_log.entries) for repo_log in repo_logs] == [2, 1]
+    assert dropped == {repo_a: 0, repo_b: 2}
+    assert repo_logs[1].entries[0].date_parsed is not None
+
+
+def test_fetch_entries_later_folder_first(tmp_path, make_repo, monkeypatch):
+    repo_a = make_repo(str(tmp_path / "a"), ["first", "second"])
+    repo_b = str(tmp_path / "b")
+    subprocess.run(["git", "clone", "-q", repo_a, repo_b], check=True)
+    make_repo(repo_b, ["third"])
+    repo_c = make_repo(str(tmp_path / "c"), ["fourth"])
+    collect_git_logs = engine.collect_git_logs
+    progress = []
+
+    def collect(folders, *args, on_progress, **kwargs):
+        repo_logs = collect_git_logs(folders, *args, **kwargs)
+        # repositories finish in reversed order of folders
+        for done, repo_log in enumerate(reversed(repo_logs), 1):
+            on_progress(repo_log, done, len(repo_logs))
+            if repo_log.folder != repo_a:
+                # waits for the first folder
+                assert progress == []
+        return repo_logs
+
+    monkeypatch.setattr(engine, "collect_git_logs", collect)
+    repo_logs, dropped = engine.fetch_entries(
+        [repo_a, repo_b, repo_c],
+        "2000-01-01",
+        Config.DEF_DATE_FORMAT_VALUE,
+        on_progress=lambda repo_log, done, total: progress.append(
+            (repo_log.folder, done, total)
+        ),
+    )
+
+    assert progress == [(repo_a, 1, 3), (repo_b, 2, 3), (repo_c, 3, 3)]
+    assert [len(repo_log.entries) for repo_log in repo_logs] == [2, 1, 1]
+    assert dropped == {repo_a: 0, repo_b: 2, repo_c: 0}
+
+
+@pytest.mark.parametrize("transform_chunk_size", [1, 100])
+def test_fetch_entries_transform_workers(
+    tmp_path, make_repo, monkeypatch, transform_chunk_size
+):
+    transform_pool = engine.TransformPool()
+    pools = []
+    get_pool = transform_pool.get
+
+    def get(workers):
+        pools.append(get_pool(workers))
+        return pools[-1]
+
+    monkeypatch.setattr(transform_pool, "get", get)
+    monkeypatch.setattr(engine, "transform_pool", transform_pool)
+    repo_a = make_repo(str(tmp_path / "a"), ["first\n\nJIRA-1", "second"])
+    repo_b = str(tmp_path / "b")
+    subprocess.run(["git", "clone", "-q", repo_a, repo_b], check=True)
+    make_repo(repo_b, ["third JIRA-3", "other"], author="Other <other@example.org>")
+    make_repo(repo_b, ["fourth"])
+
+    def fetch(authors, **kwargs):
+        repo_logs, dropped = engine.fetch_entries(
+            [repo_a, repo_b],
+            "2000-01-01",
+            Config.DEF_DATE_FORMAT_VALUE,
+            max_workers=1,
+            authors=authors,
+            custom_id_rules=[("jira", r"JIRA-\d+")],
+            **kwargs,
+        )
+        entries = [
+            (e.message, e.date_parsed, e.custom_ids, e.custom_id)
+            for e in engine.merge_repo_logs(repo_logs)
+        ]
+        return entries, dropped
+
+    for authors, count in [(None, 5), (["Test User"], 3)]:
+        expected = fetch(authors)
+        assert len(expected[0]) == count
+        # authors are checked by worker processes
+        assert (
+            fetch(
+                authors,
+                transform_workers=2,
+                transform_chunk_size=transform_chunk_size,
+            )
+            == expected
+        )
+    transform_pool.shutdown()
+    if transform_chunk_size == 1:
+        # pool is shared by fetches
+        assert len(pools) == 4
+        assert all(pool is pools[0] for pool in pools)
+    else:
+        # pool is not started for small repositories
+        assert pools == []
+
+
+def test_transform_pool():
+    transform_pool = engine.TransformPool()
+    pool = transform_pool.get(1)
+
+    assert transform_pool.get(1) is pool
+    # pool is started again for other number of workers and after shutdown
+    other = transform_pool.get(2)
+    assert other is not pool
+    transform_pool.shutdown()
+    assert transform_pool.get(2) is not other
+    transform_pool.shutdown()
+
+
+def test_collect_git_logs_cancelled(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    token = CancelToken()
+    token.cancel()
+
+    repo_logs = engine.collect_git_logs([repo], "2000-01-01", cancel_token=token)
+
+    assert "cancelled" in str(repo_logs[0].error)
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_collect_git_logs_before(tmp_path, make_repo, cwpl_db, use_cache):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    cwpl_db.add_path(repo)
+
+    def count(after, before):
+        repo_logs = engine.collect_git_logs(
+            [repo], after, before=before, use_cache=use_cache
+        )
+        return len(repo_logs[0].entries)
+
+    assert count("2000-01-01", "2001-01-01") == 0
+    assert count("2000-01-01", None) == 1
+    assert count("2000-01-01", "2999-01-01") == 1
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_collect_git_logs_before_day(
+    tmp_path, make_repo, cwpl_db, monkeypatch, use_cache
+):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2024-01-31T23:30:00")
+    repo = make_repo(str(tmp_path / "repo"), ["last day"])
+    cwpl_db.add_path(repo)
+
+    def count(before):
+        repo_logs = engine.collect_git_logs(
+            [repo], "2024-01-01", before=before, use_cache=use_cache
+        )
+        return len(repo_logs[0].entries)
+
+    # date is taken till its end, date time as is
+    assert count("2024-01-31") == 1
+    assert count("2024-01-30") == 0
+    assert count("2024-01-31T23:00:00") == 0
+    assert engine.date_to_timestamp(
+        "2024-01-31", end_of_day=True
+    ) + 1 == engine.date_to_timestamp("2024-02-01")
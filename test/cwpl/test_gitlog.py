@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import pytest
+import cwpl.gitlog as gitlog
+from cwpl.db import Config
+
+
+def test_parse_git_log_records_chunks():
+    message = 'fix "quotes"},\n{braces}\nпривіт\n'
+    raw = (
+        f"abc\x00A <a@b>\x002001-01-01 00:00:00 +0000\x00978307200\x00{message}\x1e\x00"
+    )
+    raw += "def\x00B <b@b>\x002001-01-02 00:00:00 +0000\x00978393600\x00second\n\x1e"
+    data = raw.encode("utf-8")
+    # split output into small chunks, also in the middle of multibyte chars
+    chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+
+    entries = list(gitlog.parse_git_log_records(chunks))
+
+    assert [e.commit for e in entries] == ["abc", "def"]
+    assert entries[0].message == message
+    assert entries[1].author == "B <b@b>"
+
+
+def test_parse_git_log_records_wrong_format():
+    with pytest.raises(gitlog.GitLogError):
+        list(gitlog.parse_git_log_records([b"abc\x00def\x1e"]))
+
+
+def test_iter_git_log_same_as_json_format(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first", "second\n\nbody {}"])
+
+    entries = list(gitlog.iter_git_log(repo, "2000-01-01"))
+    json_entries = gitlog.fetch_git_log(
+        repo, "2000-01-01", Config.DEF_GIT_LOG_FORMAT_VALUE
+    )
+
+    assert [e.as_dict() for e in entries] == [e.as_dict() for e in json_entries]
+    assert all(isinstance(e.timestamp, int) for e in entries)
+
+
+def test_iter_git_log_error(tmp_path):
+    with pytest.raises(gitlog.GitLogError):
+        list(gitlog.iter_git_log(str(tmp_path), "2000-01-01"))
+
+
+def test_iter_git_log_cancel(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first", "second"])
+    token = gitlog.CancelToken()
+
+    entries = gitlog.iter_git_log(repo, "2000-01-01", cancel_token=token)
+    next(entries)
+    token.cancel()
+    with pytest.raises(gitlog.GitLogError, match="cancelled"):
+        list(entries)
+
+
+def test_run_git_env(tmp_path, make_repo, monkeypatch):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    monkeypatch.setenv("LC_ALL", "uk_UA.UTF-8")
+    monkeypatch.setenv("GIT_PAGER", "less")
+
+    out = gitlog.run_git(repo, ["-c", "alias.printenv=!env", "printenv"])
+
+    env = dict(line.split("=", 1) for line in out.splitlines() if "=" in line)
+    for name, value in gitlog.GIT_ENV.items():
+        assert env[name] == value
+
+
+def test_iter_git_log_threads(tmp_path, make_repo):
+    """dozens of fetches at once from threads get entries of their repositories"""
+
+    cwd = os.getcwd()
+    repos = [
+        make_repo(
+            str(tmp_path / f"repo{i}"), [f"repo{i} {n}" for n in range(i % 4 + 1)]
+        )
+        for i in range(8)
+    ]
+    expected = {
+        repo: [e.as_dict() for e in gitlog.iter_git_log(repo, "2000-01-01")]
+        for repo in repos
+    }
+
+    def fetch(repo):
+        return repo, [e.as_dict() for e in gitlog.iter_git_log(repo, "2000-01-01")]
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(fetch, repos * 8))
+
+    assert len(results) == 64
+    for repo, entries in results:
+        assert entries == expected[repo]
+    assert os.getcwd() == cwd
+
+
+@pytest.mark.parametrize(
+    "date, timestamp",
+    [
+        ("2020-01-01 12:30:00 +0000", 1577881800),
+        ("2020-01-01 14:00:00 +0130", 1577881800),
+        ("2020-01-01 07:30:00 -0500", 1577881800),
+        # no timestamp in custom git log format
+        ("2020-01-01 07:30:00 -0500", None),
+    ],
+)
+def test_transform_log_entry_date(date, timestamp):
+    date_format = Config.DEF_DATE_FORMAT_VALUE
+    entry = gitlog.Entry("c", "a", date, timestamp, "m")
+
+    gitlog.transform_log_entry(entry, date_format)
+
+    expected = datetime.strptime(date, date_format)
+    assert entry.date_parsed == expected
+    assert entry.date_parsed.utcoffset() == expected.utcoffset()
+
+
+def test_transform_log_entry_custom_format():
+    entry = gitlog.Entry("c", "a", "01.02.2020", None, "m")
+    gitlog.transform_log_entry(entry, "%d.%m.%Y")
+    assert entry.date_parsed == datetime(2020, 2, 1)
+
+
+def test_transform_log_entry_custom_id():
+    date = "2020-01-01 12:30:00 +0000"
+    message = "fix #12\n\nABC-12\nChange-Id: I1234\n"
+
+    entry = gitlog.transform_log_entry(
+        gitlog.Entry("c", "a", date, None, message), Config.DEF_DATE_FORMAT_VALUE
+    )
+    assert entry.custom_id == "I1234"
+    assert entry.custom_ids == {"change_id": "I1234"}
+
+    entry = gitlog.transform_log_entry(
+        gitlog.Entry("c", "a", date, None, message),
+        Config.DEF_DATE_FORMAT_VALUE,
+        [("jira", r"\b([A-Z]+-\d+)\b"), ("bug", r"bug-(\d+)")],
+    )
+    assert entry.custom_id == "ABC-12"
+    assert entry.custom_ids == {"jira": "ABC-12", "bug": ""}
+    assert entry.as_dict()["jira"] == "ABC-12"
+
+
+def test_make_custom_id_matcher():
+    match = gitlog.make_custom_id_matcher(
+        [
+            ("change_id", r"(?i)change-id\s*:\s*([A-Za-z0-9]+)"),
+            ("jira", r"\b([A-Z][A-Z0-9]+-[0-9]+)\b"),
+            ("github", r"(?<![\w&/])#([0-9]+)\b"),
+            ("word", r"\bTODO\b"),
+        ]
+    )
+
+    assert match("PRJ-1 fix #42 TODO\nCHANGE-ID: Iabc\nPRJ-2\n") == {
+        "change_id": "Iabc",
+        "jira": "PRJ-1",
+        "github": "42",
+        "word": "TODO",
+    }
+    assert match("nothing&#1") == {
+        "change_id": "",
+        "jira": "",
+        "github": "",
+        "word": "",
+    }
+    assert gitlog.make_custom_id_matcher([])("PRJ-1") == {}
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        [("two_groups", r"(a)(b)")],
+        [("wrong", r"(a")],
+        [("not id", r"a")],
+        [("message", r"a")],
+    ],
+)
+def test_make_custom_id_matcher_wrong_rule(rules):
+    with pytest.raises(ValueError):
+        gitlog.make_custom_id_matcher(rules)
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import pytest
+import cwpl.engine as engine
+import cwpl.health as health
+from cwpl.health import RepoHealthCache, RepoHealthError
+
+
+def test_check_repository(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    worktree = str(tmp_path / "worktree")
+    subprocess.run(
+        ["git", "-C", repo, "worktree", "add", "-q", "--detach", worktree], check=True
+    )
+    bare = str(tmp_path / "bare.git")
+    subprocess.run(["git", "clone", "-q", "--bare", repo, bare], check=True)
+    packed = make_repo(str(tmp_path / "packed"), ["first"])
+    subprocess.run(["git", "-C", packed, "pack-refs", "--all"], check=True)
+    empty = str(tmp_path / "empty")
+    subprocess.run(["git", "init", "-q", empty], check=True)
+    # HEAD without commits, commits are in other branch
+    unborn = make_repo(str(tmp_path / "unborn"), ["first"])
+    subprocess.run(
+        ["git", "-C", unborn, "checkout", "-q", "--orphan", "new"], check=True
+    )
+    folder = str(tmp_path / "folder")
+    os.makedirs(folder)
+    missing = str(tmp_path / "missing")
+
+    def check(path):
+        try:
+            RepoHealthCache().check(path)
+        except RepoHealthError as e:
+            return e
+        return None
+
+    errors = {
+        path: check(path)
+        for path in [repo, worktree, bare, packed, empty, unborn, folder, missing]
+    }
+
+    assert errors[repo] is None
+    assert errors[unborn] is None
+    assert errors[worktree] is None
+    assert errors[bare] is None
+    assert errors[packed] is None
+    assert "no commits" in str(errors[empty])
+    assert "not a git repository" in str(errors[folder])
+    assert "not found" in str(errors[missing])
+
+
+def test_check_repository_reftable(tmp_path, make_repo):
+    repo = str(tmp_path / "repo")
+    init = subprocess.run(
+        ["git", "init", "-q", "--ref-format=reftable", repo], capture_output=True
+    )
+    if init.returncode:
+        pytest.skip("git does not support reftable")
+    cache = RepoHealthCache()
+
+    with pytest.raises(RepoHealthError):
+        cache.check(repo)
+    # refs are not files, HEAD is refs/heads/.invalid
+    make_repo(repo, ["first"])
+    cache.check(repo)
+
+
+def test_health_cache(tmp_path, make_repo, monkeypatch):
+    empty = str(tmp_path / "empty")
+    subprocess.run(["git", "init", "-q", empty], check=True)
+    checked = []
+    check_git_dirs = health.check_git_dirs
+    monkeypatch.setattr(
+        health,
+        "check_git_dirs",
+        lambda folder, *args: checked.append(folder) or check_git_dirs(folder, *args),
+    )
+    cache = RepoHealthCache()
+
+    for _ in range(2):
+        with pytest.raises(RepoHealthError):
+            cache.check(empty)
+    assert checked == [empty]
+
+    # the first commit creates branch
+    make_repo(empty, ["first"])
+    cache.check(empty)
+    cache.check(empty)
+    assert checked == [empty, empty]
+
+
+def test_collect_git_logs_skips_broken(tmp_path, make_repo):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    broken = make_repo(str(tmp_path / "broken"), ["first"])
+    os.remove(os.path.join(broken, ".git", "HEAD"))
+
+    repo_logs = engine.collect_git_logs([broken, repo], "2000-01-01")
+
+    # engine imports health module as top level one
+    assert type(repo_logs[0].error).__name__ == "RepoHealthError"
+    assert "HEAD" in str(repo_logs[0].error)
+    assert len(repo_logs[1].entries) == 1
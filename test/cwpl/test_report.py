@@ -0,0 +1,130 @@
+import io
+import os
+import subprocess
+import cwpl.report as report
+from cwpl.db import Config
+from cwpl.stats import Stats
+
+
+def test_write_report(tmp_path, make_repo, cwpl_db):
+    repo_a = make_repo(str(tmp_path / "a"), ["first", "second"])
+    repo_b = make_repo(str(tmp_path / "b"), ["third"], author="Other <o@example.com>")
+    cwpl_db.add_path(repo_a)
+    cwpl_db.add_path(repo_b)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+
+    output = io.StringIO()
+    assert report.write_report(output, "2000-01-01", sort=True) == []
+    # commits are made in the same second
+    assert sorted(output.getvalue().splitlines()) == ["first", "second"]
+
+    # commits till before
+    output = io.StringIO()
+    assert report.write_report(output, "2000-01-01", before="2001-01-01") == []
+    assert output.getvalue() == ""
+
+
+def test_write_report_dropped(tmp_path, make_repo, cwpl_db):
+    repo_a = make_repo(str(tmp_path / "a"), ["first", "second"])
+    repo_b = str(tmp_path / "b")
+    subprocess.run(["git", "clone", "-q", repo_a, repo_b], check=True)
+    cwpl_db.add_path(repo_a)
+    cwpl_db.add_path(repo_b)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+    stats = Stats()
+
+    dropped = []
+    output = io.StringIO()
+    report.write_report(
+        output,
+        "2000-01-01",
+        max_workers=1,
+        stats=stats,
+        on_dropped=lambda folder, count: dropped.append((folder, count)),
+    )
+    # commits of clone are reported once
+    assert sorted(output.getvalue().splitlines()) == ["first", "second"]
+    assert dropped == [(repo_b, 2)]
+    assert stats.folders[repo_b]["dedup"].dropped == 2
+
+
+def test_write_report_failed(tmp_path, make_repo, cwpl_db):
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    missing = str(tmp_path / "missing")
+    os.mkdir(missing)
+    cwpl_db.add_path(repo)
+    cwpl_db.add_path(missing)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+
+    errors = []
+    output = io.StringIO()
+    failed = report.write_report(output, "2000-01-01", on_error=errors.append)
+    assert [repo_log.folder for repo_log in failed] == [missing]
+    assert errors == failed
+    assert output.getvalue() == "first\n"
+
+
+def test_write_report_since_last(tmp_path, make_repo, cwpl_db, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-01-01T12:00:00")
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    cwpl_db.add_path(repo)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+
+    def write(**kwargs):
+        output = io.StringIO()
+        assert report.write_report(output, "2000-01-01", **kwargs) == []
+        return output.getvalue()
+
+    assert write(before="2020-06-01") == "first\n"
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-07-01T12:00:00")
+    make_repo(repo, ["second"])
+
+    # only commits after cut-off of previous report
+    assert write(before="2021-01-01", since_last=True) == "second\n"
+    assert write(before="2021-01-01", since_last=True) == ""
+    # older report does not move cut-off back
+    assert write(before="2020-06-01") == "first\n"
+    assert write(before="2021-01-01", since_last=True) == ""
+    assert sorted(write(before="2021-01-01").splitlines()) == ["first", "second"]
+
+
+def test_write_report_since_last_before_day(tmp_path, make_repo, cwpl_db, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-01-31T12:00:00")
+    repo = make_repo(str(tmp_path / "repo"), ["last day"])
+    cwpl_db.add_path(repo)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+
+    def write(**kwargs):
+        output = io.StringIO()
+        assert report.write_report(output, "2020-01-01", **kwargs) == []
+        return output.getvalue()
+
+    # commit of before day is reported once
+    assert write(before="2020-01-31", since_last=True) == "last day\n"
+    assert write(before="2020-02-29", since_last=True) == ""
+
+
+def test_mark_reported(tmp_path, make_repo, cwpl_db, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-01-01T12:00:00")
+    repo = make_repo(str(tmp_path / "repo"), ["first"])
+    cwpl_db.add_path(repo)
+    cwpl_db.add_user("Test User")
+    cwpl_db.update_config_by_name(Config.DEF_ENTRY_LOG_FORMAT, "{message}")
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-07-01T12:00:00")
+    make_repo(repo, ["second"])
+
+    cutoff = report.get_report_cutoff("2020-03-01")
+    assert cutoff == report.date_to_timestamp("2020-03-02") - 1
+    assert report.get_report_cutoff() > cutoff
+    # folders of fetch in UI are marked by REPORT DONE
+    report.mark_reported([repo], cutoff)
+    assert cwpl_db.get_report_cutoffs() == {repo: cutoff}
+
+    output = io.StringIO()
+    assert report.write_report(output, "2000-01-01", since_last=True) == []
+    assert output.getvalue() == "second\n"
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import cwpl.scan as scan
+
+
+def test_find_repositories(tmp_path, make_repo):
+    work = tmp_path / "work"
+    repo = make_repo(str(work / "group" / "repo"), ["first"])
+    # nested repository is not scanned
+    make_repo(os.path.join(repo, "nested"), ["second"])
+    worktree = str(work / "worktree")
+    subprocess.run(
+        ["git", "-C", repo, "worktree", "add", "-q", "--detach", worktree], check=True
+    )
+    bare = str(work / "other" / "bare.git")
+    subprocess.run(["git", "init", "-q", "--bare", bare], check=True)
+    os.makedirs(work / "empty" / "dir")
+    os.symlink(repo, work / "link")
+
+    assert scan.find_repositories(str(work)) == sorted([repo, worktree, bare])
+    assert scan.find_repositories(str(work), max_workers=1) == sorted(
+        [repo, worktree, bare]
+    )
+
+
+def test_find_repositories_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan, "SCAN_BATCH_SIZE", 2)
+    folders = [str(tmp_path / f"dir{i}" / "repo") for i in range(5)]
+    for folder in folders:
+        os.makedirs(os.path.join(folder, ".git"))
+
+    assert scan.find_repositories(str(tmp_path)) == folders
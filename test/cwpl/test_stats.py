@@ -0,0 +1,58 @@
+import pytest
+import cwpl.engine as engine
+from cwpl.db import Config
+from cwpl.stats import Stats, measure
+
+
+def test_stats():
+    stats = Stats()
+    with measure(stats, "parse", "a") as stage_stats:
+        stage_stats.entries = 2
+    with measure(stats, "parse", "b") as stage_stats:
+        stage_stats.entries = 3
+        stage_stats.size = 100
+    with measure(stats, "dedup", "b") as stage_stats:
+        stage_stats.dropped = 2
+    # nothing is recorded without stats
+    with measure(None, "parse", "a") as stage_stats:
+        stage_stats.entries = 5
+
+    totals = stats.totals()
+    assert list(totals) == ["parse", "dedup"]
+    assert totals["parse"].entries == 5
+    assert totals["parse"].size == 100
+    assert totals["dedup"].dropped == 2
+    assert stats.format()[0] == "a:"
+    assert stats.format()[-1].endswith(", 2 dropped")
+    assert stats.summary().startswith("parse: ")
+    assert stats.summary().endswith(", 2 dropped")
+
+
+@pytest.mark.parametrize(
+    "git_log_format, stages",
+    [
+        (None, ["health", "git", "decode", "parse", "dedup", "transform"]),
+        (
+            Config.DEF_GIT_LOG_FORMAT_VALUE,
+            ["health", "git", "decode", "fix quotes", "parse", "dedup", "transform"],
+        ),
+    ],
+)
+def test_fetch_entries_stats(tmp_path, make_repo, git_log_format, stages):
+    repo = make_repo(str(tmp_path / "repo"), ["first", "second"])
+    stats = Stats()
+
+    engine.fetch_entries(
+        [repo],
+        "2000-01-01",
+        Config.DEF_DATE_FORMAT_VALUE,
+        git_log_format,
+        stats=stats,
+    )
+
+    assert list(stats.folders) == [repo]
+    repo_stats = stats.folders[repo]
+    assert list(repo_stats) == stages
+    assert repo_stats["git"].size > 0
+    assert repo_stats["parse"].entries == 2
+    assert repo_stats["transform"].entries == 2
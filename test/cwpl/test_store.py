@@ -0,0 +1,110 @@
+from cwpl.gitlog import Entry
+from cwpl.store import EntryStore
+
+
+def test_entry_store():
+    store = EntryStore()
+    first = store.add([Entry("a", "author", "date", 0, "msg")])
+    second = store.add(
+        [Entry("b", "author", "date", 0, "msg"), Entry("a", "author", "date", 0, "x")]
+    )
+
+    assert list(first) == [0]
+    assert list(second) == [1, 2]
+    assert len(store) == 3
+    assert store[2].message == "x"
+    assert [entry.commit for entry in store] == ["a", "b", "a"]
+
+
+def test_entry_store_orders():
+    store = EntryStore()
+    store.add([Entry(c, a, "date", 0, "msg") for c, a in [("c", "x"), ("a", "y")]])
+    calls = []
+
+    def key(entry):
+        calls.append(entry.commit)
+        return entry.commit
+
+    assert store.get_order("commit", key) == [1, 0]
+    # cached order is reversed without keys
+    assert store.get_order("commit", key, reverse=True) == [0, 1]
+    assert store.get_order("commit", key) == [1, 0]
+    assert calls == ["c", "a"]
+
+    # added entries are merged into cached order, keys are taken once
+    store.add([Entry(c, "z", "date", 0, "msg") for c in ["d", "b", "a"]])
+    assert calls == ["c", "a", "d", "b", "a"]
+    assert [store[i].commit for i in store.get_order("commit", key)] == [
+        "a",
+        "a",
+        "b",
+        "c",
+        "d",
+    ]
+    # equal keys keep order of adding
+    assert store.get_order("commit", key)[:2] == [1, 4]
+    assert store.get_order("author", lambda e: e.author) == [0, 1, 2, 3, 4]
+
+    store.clear()
+    assert store.get_order("commit", key) == []
+
+
+def test_entry_store_search():
+    store = EntryStore()
+    entries = [
+        Entry("a", "Test User <test@example.com>", "date", 0, "Fix parser\n"),
+        Entry("b", "Other User <other@example.com>", "date", 0, "Add Parsing"),
+        Entry("c", "Test User <test@example.com>", "date", 0, "Привіт світ"),
+    ]
+    entries[1].custom_ids = {"jira": "CWPL-12"}
+    entries[1].custom_id = "CWPL-12"
+    store.add(entries[:2])
+
+    assert store.search("") is None
+    assert store.search(" - ") is None
+    assert store.search("pars") == {0, 1}
+    assert store.search("PARS test") == {0}
+    assert store.search("cwpl-1") == {1}
+    assert store.search("other@") == {1}
+    assert store.search("parsers") == set()
+
+    # new words are indexed as entries are added
+    store.add(entries[2:])
+    assert store.search("світ") == {2}
+    assert store.search("test") == {0, 2}
+
+    store.clear()
+    assert store.search("test") == set()
+
+
+def test_entry_store_update():
+    store = EntryStore()
+    entries = [Entry(c, "author", "date", 0, m) for c, m in [("a", "b"), ("b", "a")]]
+    store.add(entries)
+    message = lambda entry: entry.message
+    assert store.get_order("message", message) == [1, 0]
+    assert store.search("body") == set()
+
+    # message with body is loaded
+    entries[1].message = "c\n\nbody"
+    store.update([1])
+
+    assert store.search("body") == {1}
+    assert store.search("c") == {1}
+    assert store.get_order("message", message) == [0, 1]
+    assert store.get_order("message", message, reverse=True) == [1, 0]
+
+
+def test_entry_as_dict():
+    entry = Entry.from_dict(
+        {"commit": "a", "author": "b", "date": "c", "message": "d", "subject": "e"}
+    )
+
+    assert entry.timestamp is None
+    assert entry.as_dict() == {
+        "commit": "a",
+        "author": "b",
+        "date": "c",
+        "message": "d",
+        "subject": "e",
+    }
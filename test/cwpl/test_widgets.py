@@ -0,0 +1,129 @@
+import tkinter as tk
+import pytest
+from cwpl.widgets import VirtualTreeview
+
+
+class FakeTreeview:
+    """Items of ttk.Treeview without window"""
+
+    def __init__(self):
+        # {iid: (parent, values)} in order of insertion
+        self.items = {}
+        self.selected = ()
+        self.focused = ""
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def insert(self, parent, index, iid, text, values=()):
+        self.items[iid] = (parent, values)
+
+    def delete(self, *iids):
+        for iid in iids:
+            for child in self.get_children(iid):
+                self.delete(child)
+            del self.items[iid]
+
+    def get_children(self, iid=""):
+        return [i for i, (parent, _) in self.items.items() if parent == iid]
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def parent(self, iid):
+        return self.items[iid][0]
+
+    def item(self, iid, **kwargs):
+        pass
+
+    def focus(self):
+        return self.focused
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, iids):
+        self.selected = tuple(iids)
+
+
+class FakeScrollbar:
+    def configure(self, **kwargs):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+@pytest.fixture
+def view(monkeypatch):
+    monkeypatch.setattr(VirtualTreeview, "_rows", lambda self: 3)
+    loaded = []
+
+    def get_row(entry):
+        return entry, (entry,), [f"{entry} line"]
+
+    view = VirtualTreeview(FakeTreeview(), FakeScrollbar(), get_row, loaded.extend)
+    view.loaded = loaded
+    return view
+
+
+def test_virtual_treeview_window(view):
+    view.set_entries(list("abcdefgh"))
+    treeview = view.treeview
+
+    # only visible entries are inserted, with placeholder of lines
+    assert treeview.get_children() == ["0", "1", "2"]
+    assert treeview.get_children("0") == ["0."]
+    assert view.scrollbar.position == (0, 3 / 8)
+
+    view.yview(tk.SCROLL, "1", tk.PAGES)
+    assert view.visible == [3, 4, 5]
+    # offset stays inside of order
+    view.yview(tk.SCROLL, "10", tk.UNITS)
+    assert view.visible == [5, 6, 7]
+    view.yview(tk.MOVETO, "0.25")
+    assert view.visible == [2, 3, 4]
+
+    # order is given by indexes of entries, window is kept full
+    view.set_order([7, 1, 4, 0])
+    assert view.visible == [1, 4, 0]
+    view.set_order([7, 1, 4])
+    assert view.visible == [7, 1, 4]
+    assert treeview.get_children() == ["7", "1", "4"]
+
+
+def test_virtual_treeview_selection(view):
+    view.set_entries(list("abcdefgh"))
+    treeview = view.treeview
+
+    treeview.selected = ("1", "2.0")
+    view._on_select(None)
+    view.yview(tk.SCROLL, "1", tk.PAGES)
+    treeview.selected = ("4",)
+    view._on_select(None)
+    # selection out of view is kept
+    assert view.get_selected() == [1, 4]
+    view.set_order([4, 3, 2, 1])
+    assert view.get_selected() == [4, 1]
+    # visible entries are 3, 2, 1
+    assert treeview.selected == ("1",)
+
+
+def test_virtual_treeview_open(view):
+    view.set_entries(list("abcd"))
+    treeview = view.treeview
+
+    # lines are loaded and inserted on opening
+    treeview.focused = "1"
+    view._on_open(None)
+    assert view.loaded == [1]
+    assert treeview.get_children("1") == ["1.0"]
+    assert treeview.items["1.0"][1] == ("", "", "b line")
+
+    # opened item is shown with lines after refresh
+    view.refresh()
+    assert treeview.get_children("1") == ["1.0"]
+    view._on_close(None)
+    view.refresh()
+    assert treeview.get_children("1") == ["1."]
+    assert view.loaded == [1]
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# limits of time of imports done by tool, ms
+HELP_IMPORT_THRESHOLD = 200
+# SQLAlchemy alone takes most of it
+DB_IMPORT_THRESHOLD = 1000
+
+# modules which are loaded only by commands which need them
+UI_MODULES = {"tkinter", "tkcalendar", "babel", "gradio"}
+DB_MODULES = {"sqlalchemy"}
+
+
+def import_times(args):
+    """Run python with args, returns {module: cumulative import time, ms}
+    of all modules imported by it
+    """
+
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # nested imports are indented
+            times[name[1:].rstrip()] = int(cumulative) / 1000
+    return times
+
+
+def startup_time(args):
+    """Returns time of top level imports which are not done
+    by interpreter itself, ms, and names of all imported modules
+    """
+
+    interpreter = import_times(["-c", "pass"])
+    times = import_times(args)
+    total = sum(
+        t
+        for name, t in times.items()
+        if not name.startswith(" ") and name not in interpreter
+    )
+    return total, {name.strip().split(".")[0] for name in times}
+
+
+@pytest.mark.parametrize("tool", ["cwpl.py", "jams.py"])
+def test_help_startup(tool):
+    total, modules = startup_time([tool, "--help"])
+
+    assert not modules & (UI_MODULES | DB_MODULES)
+    assert total < HELP_IMPORT_THRESHOLD
+
+
+def test_cwpl_db_startup():
+    total, modules = startup_time(["-c", "import cwpl; cwpl.init_db"])
+
+    assert modules & DB_MODULES
+    assert not modules & UI_MODULES
+    assert total < DB_IMPORT_THRESHOLD